@@ -1,21 +1,34 @@
 from contextlib import asynccontextmanager
-from typing import List, Dict, Any
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query
+from typing import List, Dict, Any, Optional, Tuple
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 import asyncpg
 import os
+import re
+import orjson
+import hashlib
 from dotenv import load_dotenv
 from pathlib import Path
 import tempfile
 import asyncio
+import time
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 from models.schemas import (
     HealthResponse,
     IngestResponse,
+    IngestJobResponse,
+    IngestJobStatus,
     QuestionRequest,
     QuestionResponse,
     QuestionResponseV2,
+    QuestionBatchResponse,
+    QUESTION_V2_LIST,
     GenerationMetadata,
     FilesResponse,
     StyleProfile,
@@ -27,56 +40,227 @@ from models.schemas import (
     ExamSystemOption
 )
 from services.pdf_parser import PDFParser
-from services.embedder import EmbeddingService
+from services.embedder import EmbeddingService, register_vector_codecs
 from services.vision import VisionService
 from services.rag_engine import MultiAgentRAGEngine, RAGEngine
 from services.pdf_exporter import PDFExporter
 from services.style_analyzer import StyleAnalyzer
 from services.topic_extractor import TopicExtractor
+from services.ingest_queue import IngestJobQueue
+from services.hybrid_retriever import (
+    vector_search_sql, keyword_search_sql, fused_search_sql, FUSED_SEARCH, CONTENT_BY_ID_SQL
+)
+from services.agents import close_shared_clients
 
 # Load environment variables
 load_dotenv()
 
-# Database connection pool
+# Database connection pools: db_pool serves ingestion and generation,
+# oltp_pool serves short queries (health, listings) so slow vector searches
+# cannot starve them
 db_pool = None
+oltp_pool = None
+
+# Embedding dimension of knowledge_base.embedding (text-embedding-3-small)
+EMBEDDING_DIM = 1536
+
+# Uploads are copied to disk in slices of this size so memory stays bounded
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# HNSW candidate list size for vector searches on the generation pool
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+
+# /health reports the result of a background SELECT 1 instead of querying
+# per request; results older than HEALTH_STALE_AFTER count as unreachable
+HEALTH_POLL_INTERVAL = float(os.getenv("HEALTH_POLL_INTERVAL", "5"))
+HEALTH_STALE_AFTER = 2 * HEALTH_POLL_INTERVAL
+
+# /ingest returns 503 once this many requests are waiting for an ingest slot
+INGEST_MAX_WAITING = int(os.getenv("INGEST_MAX_WAITING", "8"))
+
+# Non-streaming generation results reused for identical requests
+GENERATION_CACHE_SIZE = int(os.getenv("GENERATION_CACHE_SIZE", "256"))
+GENERATION_CACHE_TTL = float(os.getenv("GENERATION_CACHE_TTL", "300"))
+
+# Sentinel queued by /generate/stream when the generation task finishes
+STREAM_DONE = object()
+
+# Fields of the original /generate response format
+QUESTION_RESPONSE_FIELDS = tuple(QuestionResponse.model_fields)
+
+# Characters not allowed in generated download filenames
+UNSAFE_FILENAME_RE = re.compile(r'[^A-Za-z0-9_.-]')
+
+# Exported PDFs up to this size are built in memory, larger ones on disk
+PDF_SPOOL_MAX_BYTES = 1 << 20
+# Bytes per chunk when streaming an exported PDF to the client
+PDF_STREAM_CHUNK_BYTES = 64 * 1024
 
 
-import json
+def orjson_dumps_str(value: Any) -> str:
+    """Serialize with orjson for asyncpg's text-format JSON codecs"""
+    return orjson.dumps(value).decode()
+
+
+def sse_event(event: Dict[str, Any]) -> bytes:
+    """Encode an event as a server-sent events data frame"""
+    return b"data: " + orjson.dumps(event) + b"\n\n"
 
-# ... (imports)
 
 async def init_connection(conn):
-    """Initialize database connection with JSON codec"""
+    """Initialize database connection with JSON and pgvector codecs"""
     await conn.set_type_codec(
         'jsonb',
-        encoder=json.dumps,
-        decoder=json.loads,
+        encoder=orjson_dumps_str,
+        decoder=orjson.loads,
         schema='pg_catalog'
     )
     await conn.set_type_codec(
         'json',
-        encoder=json.dumps,
-        decoder=json.loads,
+        encoder=orjson_dumps_str,
+        decoder=orjson.loads,
         schema='pg_catalog'
     )
+    try:
+        await register_vector_codecs(conn)
+    except ValueError as e:
+        print(f"! WARNING: pgvector codecs not registered: {e}")
+
+
+async def init_search_connection(conn):
+    """Initialize a generation pool connection with codecs and warm statements"""
+    await init_connection(conn)
+    try:
+        await conn.execute(f"SET hnsw.ef_search = {HNSW_EF_SEARCH}")
+    except Exception as e:
+        print(f"! WARNING: Could not set hnsw.ef_search: {e}")
+    await warm_statement_cache(conn)
+
+
+async def check_vector_index(pool: asyncpg.Pool) -> None:
+    """Warn at startup if knowledge_base has no HNSW embedding index"""
+    try:
+        has_hnsw = await pool.fetchval(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM pg_indexes
+                WHERE tablename = 'knowledge_base'
+                    AND indexdef ILIKE '%USING hnsw%'
+            )
+            """
+        )
+    except Exception as e:
+        print(f"! WARNING: Vector index check skipped: {e}")
+        return
+    
+    if has_hnsw:
+        print("✓ HNSW embedding index found")
+    else:
+        print("! WARNING: No HNSW index on knowledge_base.embedding; "
+              "vector search will scan every row (apply migrations/007_halfvec_index.sql)")
+
+
+async def check_content_hash_column(pool: asyncpg.Pool) -> bool:
+    """Report whether knowledge_base has the content_sha256 column (migration 010)"""
+    try:
+        has_column = await pool.fetchval(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'knowledge_base'
+                    AND column_name = 'content_sha256'
+            )
+            """
+        )
+    except Exception as e:
+        print(f"! WARNING: Content hash column check skipped: {e}")
+        return False
+    
+    if not has_column:
+        print("! WARNING: knowledge_base.content_sha256 missing; re-ingested chunks "
+              "will not be deduplicated (apply migrations/010_content_hash.sql)")
+    return has_column
+
+
+async def warm_statement_cache(conn):
+    """
+    Prime asyncpg's per-connection statement cache with the hot queries.
+    
+    asyncpg only caches a prepared statement after it has been executed on a
+    connection, so the retrieval queries are run once with LIMIT 0 (no rows
+    are scanned) to move the prepare cost out of the first request.
+    """
+    zero_embedding = [0.0] * EMBEDDING_DIM
+    try:
+        await conn.fetchval("SELECT 1")
+        # fetch_facts and fetch_style_examples both filter on two source
+        # types, so they share the same statement text
+        await conn.fetch(vector_search_sql(2), zero_embedding, 1.0, 'textbook', 'diagram', 0)
+        await conn.fetch(keyword_search_sql(2), "", 'textbook', 'diagram', 0)
+        await conn.fetch(CONTENT_BY_ID_SQL, [])
+        if FUSED_SEARCH:
+            await conn.fetch(
+                fused_search_sql(2), zero_embedding, 1.0, "", 'textbook', 'diagram',
+                0, 0, 0.5, 0.5, 60
+            )
+    except Exception as e:
+        print(f"! WARNING: Statement cache warm-up skipped: {e}")
+
+
+async def poll_database_health(app: FastAPI) -> None:
+    """Record when the database last answered a probe, until cancelled"""
+    while True:
+        try:
+            async with oltp_pool.acquire() as conn:
+                await conn.fetchval("SELECT 1")
+            app.state.db_last_ok = time.monotonic()
+            app.state.db_last_error = None
+        except Exception as e:
+            app.state.db_last_error = str(e)
+        await asyncio.sleep(HEALTH_POLL_INTERVAL)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifespan - startup and shutdown"""
-    global db_pool
+    global db_pool, oltp_pool
     
-    # Startup: Create database connection pool
+    # Startup: Create database connection pools
     database_url = os.getenv("DATABASE_URL")
+    max_queries = int(os.getenv("DB_MAX_QUERIES", "50000"))
+    max_inactive_lifetime = float(os.getenv("DB_MAX_INACTIVE_LIFETIME", "300"))
+    connect_timeout = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    # Queries here are short index lookups and top-k scans; JIT compilation
+    # costs more than it saves and can trigger on pgvector's cost estimates
+    server_settings = {'jit': 'off'}
     try:
         db_pool = await asyncpg.create_pool(
             database_url,
-            min_size=5,
-            max_size=20,
-            command_timeout=60,
+            min_size=int(os.getenv("DB_POOL_MIN", "10")),
+            max_size=int(os.getenv("DB_POOL_MAX", "50")),
+            command_timeout=float(os.getenv("DB_COMMAND_TIMEOUT", "120")),
+            max_queries=max_queries,
+            statement_cache_size=1024,
+            max_inactive_connection_lifetime=max_inactive_lifetime,
+            timeout=connect_timeout,
+            server_settings=server_settings,
+            init=init_search_connection
+        )
+        oltp_pool = await asyncpg.create_pool(
+            database_url,
+            min_size=1,
+            max_size=int(os.getenv("DB_OLTP_POOL_MAX", "5")),
+            command_timeout=float(os.getenv("DB_OLTP_COMMAND_TIMEOUT", "10")),
+            max_queries=max_queries,
+            statement_cache_size=1024,
+            max_inactive_connection_lifetime=max_inactive_lifetime,
+            timeout=connect_timeout,
+            server_settings=server_settings,
             init=init_connection
         )
 
-        print("✓ Database connection pool created")
+        print("✓ Database connection pools created")
+        await check_vector_index(oltp_pool)
         
         # Check API Keys
         if not os.getenv("OPENAI_API_KEY"):
@@ -90,14 +274,112 @@ async def lifespan(app: FastAPI):
             print("✓ ANTHROPIC_API_KEY found")
     except Exception as e:
         print(f"✗ Failed to connect to database: {e}")
+        if db_pool:
+            await db_pool.close()
         db_pool = None
+        oltp_pool = None
+    
+    # /files response cache, invalidated by bumping files_version on any
+    # change to the knowledge base
+    app.state.files_version = 0
+    app.state.files_cache = None
+    
+    # Shared results for the non-streaming /generate endpoints
+    app.state.generation_cache = OrderedDict()
+    
+    # Build long-lived services once so requests skip client/tokenizer setup
+    app.state.embedder = None
+    app.state.rag_engine = None
+    app.state.style_analyzer = None
+    app.state.topic_extractor = None
+    if db_pool:
+        try:
+            app.state.embedder = EmbeddingService(
+                db_pool, content_hashes=await check_content_hash_column(oltp_pool)
+            )
+            app.state.rag_engine = MultiAgentRAGEngine(
+                db_pool,
+                app.state.embedder,
+                similarity_threshold=float(os.getenv("SIMILARITY_THRESHOLD", "0.85"))
+            )
+            # Post-ingest analysis shares the engine's analyzer and LLM client
+            app.state.style_analyzer = app.state.rag_engine.style_analyzer
+            app.state.topic_extractor = TopicExtractor(
+                db_pool, agent=app.state.style_analyzer.agent
+            )
+            print("✓ Embedding service and RAG engine initialized")
+        except Exception as e:
+            print(f"! WARNING: Failed to initialize generation services: {e}")
+    
+    if app.state.embedder:
+        try:
+            preloaded = await app.state.embedder.preload_query_cache()
+            print(f"✓ Preloaded {preloaded} cached query embeddings")
+        except Exception as e:
+            print(f"! WARNING: Query embedding preload skipped: {e}")
+    
+    # Vision is only used when an Anthropic key is configured; the shared
+    # service keeps its HTTP connections alive across ingests
+    app.state.vision = None
+    anthropic_key = os.getenv("ANTHROPIC_API_KEY")
+    if anthropic_key and anthropic_key.startswith('sk-ant-'):
+        try:
+            app.state.vision = VisionService()
+            print("✓ Vision service initialized")
+        except Exception as e:
+            print(f"! WARNING: Failed to initialize vision service: {e}")
+    
+    # PDF extraction is CPU-bound, so it runs in worker processes where
+    # parsing several uploads at once is not serialized by the GIL. Workers
+    # start lazily, once the event loop and threadpool are running, so they
+    # come from a forkserver: forking a threaded process can deadlock the
+    # child, and it would inherit open sockets and descriptors.
+    pdf_pool = ProcessPoolExecutor(
+        max_workers=int(os.getenv("PDF_PARSE_WORKERS", "0")) or os.cpu_count(),
+        mp_context=multiprocessing.get_context("forkserver")
+    )
+    app.state.pdf_parser = PDFParser(executor=pdf_pool)
+    # Stylesheet is built once and shared; generate_pdf only reads it
+    app.state.pdf_exporter = PDFExporter()
+    
+    # Caps ingests running at once (sync and queued) so concurrent uploads
+    # do not exhaust the embeddings/vision API rate limits together
+    app.state.ingest_sem = asyncio.Semaphore(int(os.getenv("INGEST_CONCURRENCY", "4")))
+    app.state.ingest_waiting = 0
+    
+    # Background ingestion workers for /ingest/async
+    app.state.ingest_queue = IngestJobQueue(
+        process_ingest_job,
+        workers=int(os.getenv("INGEST_WORKERS", "2")),
+        max_pending=int(os.getenv("INGEST_QUEUE_SIZE", "32")),
+        result_ttl=float(os.getenv("INGEST_RESULT_TTL", "3600"))
+    )
+    app.state.ingest_queue.start()
+    
+    app.state.background_tasks = set()
+    
+    app.state.db_last_ok = None
+    app.state.db_last_error = None
+    health_task = asyncio.create_task(poll_database_health(app)) if oltp_pool else None
     
     yield
     
-    # Shutdown: Close database connection pool
+    if health_task:
+        health_task.cancel()
+    for task in list(app.state.background_tasks):
+        task.cancel()
+    await app.state.ingest_queue.stop()
+    pdf_pool.shutdown(wait=False, cancel_futures=True)
+    if app.state.vision:
+        await app.state.vision.client.close()
+    await close_shared_clients()
+    
+    # Shutdown: Close database connection pools
+    if oltp_pool:
+        await oltp_pool.close()
     if db_pool:
         await db_pool.close()
-        print("✓ Database connection pool closed")
+        print("✓ Database connection pools closed")
 
 
 # Create FastAPI application
@@ -105,31 +387,149 @@ app = FastAPI(
     title="GenCertQuiz API",
     description="Multi-Agent RAG-powered certification quiz generator",
     version="0.2.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-# Configure CORS
+# Configure CORS: only the frontend origins listed in CORS_ORIGINS
+cors_origins = [
+    origin.strip()
+    for origin in os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
+    if origin.strip()
+]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=cors_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "DELETE"],
+    allow_headers=["content-type", "authorization"],
 )
 
 
+def get_embedder(request: Request) -> EmbeddingService:
+    """Return the app-scoped EmbeddingService built at startup"""
+    embedder = request.app.state.embedder
+    if embedder is None:
+        raise HTTPException(status_code=503, detail="Embedding service not available")
+    return embedder
+
+
+def get_style_analyzer(request: Request) -> StyleAnalyzer:
+    """Dependency returning the app-wide StyleAnalyzer"""
+    style_analyzer = request.app.state.style_analyzer
+    if style_analyzer is None:
+        raise HTTPException(status_code=503, detail="Style analyzer not available")
+    return style_analyzer
+
+
+def get_topic_extractor(request: Request) -> TopicExtractor:
+    """Dependency returning the app-wide TopicExtractor"""
+    topic_extractor = request.app.state.topic_extractor
+    if topic_extractor is None:
+        raise HTTPException(status_code=503, detail="Topic extractor not available")
+    return topic_extractor
+
+
+def get_pdf_exporter(request: Request) -> PDFExporter:
+    """Dependency returning the app-wide PDFExporter"""
+    return request.app.state.pdf_exporter
+
+
+def get_rag_engine(request: Request) -> MultiAgentRAGEngine:
+    """Return the app-scoped MultiAgentRAGEngine built at startup"""
+    rag_engine = request.app.state.rag_engine
+    if rag_engine is None:
+        raise HTTPException(status_code=503, detail="Generation service not available")
+    return rag_engine
+
+
+def spawn_background_task(coro) -> asyncio.Task:
+    """
+    Run a coroutine after the response without awaiting it.
+    
+    A strong reference is held until it finishes (the event loop only keeps
+    weak ones), and pending tasks are cancelled at shutdown.
+    """
+    task = asyncio.create_task(coro)
+    app.state.background_tasks.add(task)
+    task.add_done_callback(app.state.background_tasks.discard)
+    return task
+
+
+def invalidate_knowledge_caches(app: FastAPI) -> None:
+    """Mark cached /files, retrieval, research and generation results stale after the knowledge base changes"""
+    app.state.files_version += 1
+    app.state.generation_cache.clear()
+    if app.state.rag_engine:
+        app.state.rag_engine.retriever.semantic_cache.clear()
+        app.state.rag_engine.researcher.brief_cache.clear()
+
+
+async def run_generation(
+    request: QuestionRequest,
+    rag_engine: MultiAgentRAGEngine
+) -> List[Dict[str, Any]]:
+    """
+    Generate questions for the non-streaming endpoints, sharing results.
+    
+    /generate, /generate/v2, /generate/batch and /generate/exam-format only
+    differ in how they serialize the engine's output, so one LRU keyed by
+    (topics, difficulty, count) serves all of them. The in-flight task is
+    cached, so identical concurrent requests also share one run. Entries
+    expire after GENERATION_CACHE_TTL seconds and are dropped whenever the
+    knowledge base changes.
+    """
+    cache: OrderedDict = app.state.generation_cache
+    if GENERATION_CACHE_SIZE <= 0:
+        return await rag_engine.generate_questions(
+            topics=request.topics,
+            count=request.count,
+            difficulty=request.difficulty
+        )
+    
+    # Topic order and repeats matter: slots are assigned round-robin over
+    # the list and style examples come from its first topic
+    key = (tuple(request.topics), request.difficulty, request.count)
+    entry = cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        cache.move_to_end(key)
+        task = entry[1]
+    else:
+        task = asyncio.ensure_future(rag_engine.generate_questions(
+            topics=request.topics,
+            count=request.count,
+            difficulty=request.difficulty
+        ))
+        cache[key] = (time.monotonic() + GENERATION_CACHE_TTL, task)
+        cache.move_to_end(key)
+        if len(cache) > GENERATION_CACHE_SIZE:
+            cache.popitem(last=False)
+    
+    try:
+        # Shielded so one client disconnecting does not cancel the run for
+        # every request sharing it
+        questions = await asyncio.shield(task)
+    except Exception:
+        if cache.get(key, (None, None))[1] is task:
+            del cache[key]
+        raise
+    
+    if not questions and cache.get(key, (None, None))[1] is task:
+        del cache[key]
+    return questions
+
+
 @app.get("/health", response_model=HealthResponse)
-async def health_check():
-    """Health check endpoint"""
-    db_status = "connected" if db_pool else "disconnected"
+async def health_check(request: Request):
+    """Health check endpoint (reads the background probe, never the pool)"""
+    db_status = "disconnected"
     
-    if db_pool:
-        try:
-            async with db_pool.acquire() as conn:
-                await conn.fetchval("SELECT 1")
-                db_status = "healthy"
-        except Exception as e:
-            db_status = f"error: {str(e)}"
+    if oltp_pool:
+        last_ok = request.app.state.db_last_ok
+        if last_ok is not None and time.monotonic() - last_ok <= HEALTH_STALE_AFTER:
+            db_status = "healthy"
+        elif request.app.state.db_last_error:
+            db_status = f"error: {request.app.state.db_last_error}"
     
     return HealthResponse(
         status="ok",
@@ -149,25 +549,35 @@ async def root():
 
 
 @app.get("/files", response_model=FilesResponse)
-async def list_files():
+async def list_files(request: Request):
     """
     Get list of uploaded files grouped by source type.
     Returns metadata about uploaded PDFs stored in the database.
+    
+    The response is cached in-process until the next ingest or delete.
     """
-    if not db_pool:
+    if not oltp_pool:
         raise HTTPException(status_code=503, detail="Database not available")
     
+    # Capture the version before querying so a concurrent ingest/delete
+    # leaves this result stale instead of caching outdated data as fresh
+    version = request.app.state.files_version
+    cached = request.app.state.files_cache
+    if cached and cached[0] == version:
+        return cached[1]
+    
     try:
-        async with db_pool.acquire() as conn:
+        async with oltp_pool.acquire() as conn:
             rows = await conn.fetch(
                 """
-                SELECT DISTINCT 
+                SELECT 
                     metadata->>'filename' as filename,
                     source_type,
                     COUNT(*) as chunk_count
                 FROM knowledge_base
                 WHERE metadata->>'filename' IS NOT NULL
-                GROUP BY metadata->>'filename', source_type
+                    AND source_type IN ('textbook', 'exam_paper')
+                GROUP BY 1, 2
                 ORDER BY source_type, filename
                 """
             )
@@ -187,16 +597,18 @@ async def list_files():
                 elif row['source_type'] == 'exam_paper':
                     exam_papers.append(file_info)
             
-            return FilesResponse(
+            response = FilesResponse(
                 textbooks=textbooks,
                 exam_papers=exam_papers
             )
+            request.app.state.files_cache = (version, response)
+            return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve files: {str(e)}")
 
 
 @app.delete("/files/{filename}")
-async def delete_file(filename: str):
+async def delete_file(filename: str, request: Request):
     """
     Delete a file and all its associated data (chunks, embeddings, style profiles).
     """
@@ -204,34 +616,47 @@ async def delete_file(filename: str):
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
-        async with db_pool.acquire() as conn:
-            # Delete from knowledge_base
-            # CAST to text to ensure type matching if needed, though usually auto-cast works
-            kb_result = await conn.execute(
-                "DELETE FROM knowledge_base WHERE metadata->>'filename' = $1",
-                filename
-            )
+        async with db_pool.acquire() as conn, conn.transaction():
+            # Serialize deletes of the same file up front so concurrent
+            # requests queue on one lock instead of deadlocking on rows
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", filename)
             
-            # Delete from style_profiles
-            sp_result = await conn.execute(
-                "DELETE FROM style_profiles WHERE source_filename = $1",
-                filename
-            )
-            
-            # Delete associated topics
-            t_result = await conn.execute(
-                "DELETE FROM topics WHERE source_filename = $1",
+            # All deletes in one statement
+            counts = await conn.fetchrow(
+                """
+                WITH kb AS (
+                    DELETE FROM knowledge_base WHERE metadata->>'filename' = $1 RETURNING 1
+                ), sp AS (
+                    DELETE FROM style_profiles WHERE source_filename = $1 RETURNING 1
+                ), t AS (
+                    DELETE FROM topics WHERE source_filename = $1 RETURNING 1
+                )
+                SELECT
+                    (SELECT COUNT(*) FROM kb) AS knowledge_base_chunks,
+                    (SELECT COUNT(*) FROM sp) AS style_profiles,
+                    (SELECT COUNT(*) FROM t) AS topics
+                """,
                 filename
             )
             
-            return {
-                "message": f"Deleted {filename}",
-                "details": {
-                    "knowledge_base_chunks": kb_result.replace("DELETE ", ""),
-                    "style_profiles": sp_result.replace("DELETE ", ""),
-                    "topics": t_result.replace("DELETE ", "")
-                }
+            # Cleared so the file can be ingested again; like the lookup in
+            # find_previous_ingest, optional until migration 008 is applied.
+            # The savepoint keeps a missing table from aborting the deletes.
+            try:
+                async with conn.transaction():
+                    await conn.execute("DELETE FROM ingest_log WHERE filename = $1", filename)
+            except asyncpg.UndefinedTableError as e:
+                print(f"Ingest log cleanup skipped: {e}")
+        invalidate_knowledge_caches(request.app)
+        
+        return {
+            "message": f"Deleted {filename}",
+            "details": {
+                "knowledge_base_chunks": str(counts['knowledge_base_chunks']),
+                "style_profiles": str(counts['style_profiles']),
+                "topics": str(counts['topics'])
             }
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete file: {str(e)}")
 
@@ -242,11 +667,11 @@ async def list_topics():
     Get all extracted topics from the database.
     Returns topics grouped across all ingested textbooks.
     """
-    if not db_pool:
+    if not oltp_pool:
         raise HTTPException(status_code=503, detail="Database not available")
 
     try:
-        async with db_pool.acquire() as conn:
+        async with oltp_pool.acquire() as conn:
             rows = await conn.fetch(
                 """
                 SELECT id::text, name, source_filename
@@ -292,7 +717,9 @@ async def delete_topic(topic_id: str):
 
 
 @app.post("/topics/regenerate")
-async def regenerate_topics():
+async def regenerate_topics(
+    topic_extractor: TopicExtractor = Depends(get_topic_extractor)
+):
     """
     Delete all existing topics and re-extract them from every uploaded textbook.
     Useful when the user wants fresh topic extraction (e.g. after uploading new files).
@@ -322,7 +749,6 @@ async def regenerate_topics():
             await conn.execute("DELETE FROM topics")
 
         # 3. Re-extract topics for all textbooks concurrently
-        topic_extractor = TopicExtractor(db_pool)
         tasks = [topic_extractor.extract_and_store(fn) for fn in textbook_filenames]
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
@@ -342,10 +768,252 @@ async def regenerate_topics():
         raise HTTPException(status_code=500, detail=f"Failed to regenerate topics: {str(e)}")
 
 
+VALID_SOURCE_TYPES = ['textbook', 'question', 'exam_paper', 'diagram']
+
+
+def validate_ingest_request(file: UploadFile, source_type: str) -> None:
+    """Reject uploads that are not PDFs or use an unknown source_type"""
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    
+    if source_type not in VALID_SOURCE_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid source_type. Must be one of: {VALID_SOURCE_TYPES}"
+        )
+
+
+async def save_upload(file: UploadFile) -> Tuple[str, str]:
+    """
+    Stream an uploaded file to a temp location without buffering it in memory.
+    
+    The content hash is computed on the same pass so duplicate uploads can be
+    detected without re-reading the file.
+    
+    Returns:
+        Tuple of (temp file path, hex sha256 of the file); caller is
+        responsible for removing the file
+    """
+    digest = hashlib.sha256()
+    tmp_file = await run_in_threadpool(
+        tempfile.NamedTemporaryFile, delete=False, suffix='.pdf'
+    )
+    tmp_path = tmp_file.name
+    try:
+        with tmp_file:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                await run_in_threadpool(tmp_file.write, chunk)
+    except BaseException:
+        # The caller never sees the path of a failed upload, so remove it here
+        await run_in_threadpool(Path(tmp_path).unlink, missing_ok=True)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+async def find_previous_ingest(file_sha256: str, source_type: str) -> Optional[IngestResponse]:
+    """
+    Look up an earlier ingestion of the same file bytes and source type.
+    
+    Returns:
+        The recorded ingestion statistics, or None if the file is new
+    """
+    try:
+        row = await db_pool.fetchrow(
+            """
+            SELECT filename, chunks_stored, embeddings_generated,
+                   images_processed, topics_extracted
+            FROM ingest_log
+            WHERE file_sha256 = $1 AND source_type = $2
+            """,
+            file_sha256,
+            source_type
+        )
+    except Exception as e:
+        print(f"Ingest log lookup skipped: {e}")
+        return None
+    
+    if row is None:
+        return None
+    
+    return IngestResponse(
+        chunks_processed=row['chunks_stored'],
+        embeddings_created=row['embeddings_generated'],
+        images_processed=row['images_processed'],
+        topics_extracted=row['topics_extracted'],
+        message=f"Already ingested as {row['filename']} ({source_type}); skipped"
+    )
+
+
+async def record_ingest(
+    file_sha256: str,
+    source_type: str,
+    filename: str,
+    response: IngestResponse
+) -> None:
+    """Record a successful ingestion so identical re-uploads can be skipped"""
+    try:
+        await db_pool.execute(
+            """
+            INSERT INTO ingest_log (
+                file_sha256, source_type, filename, chunks_stored,
+                embeddings_generated, images_processed, topics_extracted
+            )
+            VALUES ($1, $2, $3, $4, $5, $6, $7)
+            ON CONFLICT (file_sha256, source_type) DO NOTHING
+            """,
+            file_sha256,
+            source_type,
+            filename,
+            response.chunks_processed,
+            response.embeddings_created,
+            response.images_processed,
+            response.topics_extracted
+        )
+    except Exception as e:
+        print(f"Ingest log write skipped: {e}")
+
+
+async def run_ingest_pipeline(
+    tmp_path: str,
+    file_sha256: str,
+    filename: str,
+    source_type: str,
+    embedder: EmbeddingService
+) -> IngestResponse:
+    """
+    Parse, describe, embed and store a saved PDF, then run post-ingest analysis.
+    
+    Files whose exact bytes were already ingested as the same source type
+    are skipped and the earlier statistics are returned.
+    
+    Args:
+        tmp_path: Path of the saved PDF
+        file_sha256: Hex sha256 of the file contents
+        filename: Original upload filename recorded in chunk metadata
+        source_type: Type of content being ingested
+        embedder: EmbeddingService used to embed and store chunks
+        
+    Returns:
+        Ingestion statistics
+    """
+    previous = await find_previous_ingest(file_sha256, source_type)
+    if previous is not None:
+        return previous
+    
+    # Step 1: Parse PDF
+    parsed_data = await app.state.pdf_parser.parse_pdf(tmp_path)
+    
+    for chunk in parsed_data['chunks']:
+        if 'metadata' not in chunk:
+            chunk['metadata'] = {}
+        chunk['metadata']['filename'] = filename
+    
+    # Step 2: Describe images with vision service (optional)
+    async def describe_images() -> List[Dict[str, Any]]:
+        vision_service = app.state.vision
+        if not (parsed_data['images'] and vision_service):
+            return []
+        try:
+            descriptions = await vision_service.batch_describe(
+                parsed_data['images'],
+                context=f"From {filename}"
+            )
+        except Exception as e:
+            print(f"Vision processing skipped: {e}")
+            return []
+        
+        return [
+            {
+                'content': desc,
+                'metadata': {
+                    'source': 'vision',
+                    'image_index': idx,
+                    'filename': filename
+                }
+            }
+            for idx, desc in enumerate(descriptions)
+            if desc
+        ]
+    
+    async def describe_and_store_images() -> Tuple[int, Dict[str, int]]:
+        vision_chunks = await describe_images()
+        if not vision_chunks:
+            return 0, {'chunks_stored': 0, 'embeddings_generated': 0}
+        vision_stats = await embedder.process_and_store(vision_chunks, source_type)
+        return len(vision_chunks), vision_stats
+    
+    # Step 3: Generate embeddings and store. Text chunks are embedded while
+    # the vision calls are in flight, and descriptions are embedded as soon
+    # as they arrive rather than after the text finishes.
+    stats, (images_processed, vision_stats) = await asyncio.gather(
+        embedder.process_and_store(parsed_data['chunks'], source_type),
+        describe_and_store_images()
+    )
+    stats['chunks_stored'] += vision_stats['chunks_stored']
+    stats['embeddings_generated'] += vision_stats['embeddings_generated']
+    
+    # Step 4: If exam_paper, extract and cache style profile in the
+    # background; the response does not depend on it
+    style_analyzer = app.state.style_analyzer
+    if source_type == 'exam_paper' and stats['chunks_stored'] > 0 and style_analyzer:
+        async def analyze_style():
+            try:
+                await style_analyzer.analyze_exam_paper(filename)
+                print(f"✓ Style profile cached for {filename}")
+            except Exception as e:
+                print(f"Style analysis skipped: {e}")
+        
+        spawn_background_task(analyze_style())
+    
+    # Step 5: If textbook, extract and store topics
+    topics_extracted = 0
+    topic_extractor = app.state.topic_extractor
+    if source_type == 'textbook' and stats['chunks_stored'] > 0 and topic_extractor:
+        try:
+            extracted_topics = await topic_extractor.extract_and_store(filename)
+            topics_extracted = len(extracted_topics)
+            print(f"✓ Extracted {topics_extracted} topics from {filename}")
+        except Exception as e:
+            print(f"Topic extraction skipped: {e}")
+    
+    response = IngestResponse(
+        chunks_processed=stats['chunks_stored'],
+        embeddings_created=stats['embeddings_generated'],
+        images_processed=images_processed,
+        topics_extracted=topics_extracted,
+        message=f"Successfully ingested {filename} as {source_type}"
+    )
+    if stats['chunks_stored'] > 0:
+        await record_ingest(file_sha256, source_type, filename, response)
+    
+    return response
+
+
+async def process_ingest_job(
+    tmp_path: str,
+    file_sha256: str,
+    filename: str,
+    source_type: str
+) -> Dict[str, Any]:
+    """Run a queued ingestion job and clean up its temp file"""
+    try:
+        async with app.state.ingest_sem:
+            response = await run_ingest_pipeline(
+                tmp_path, file_sha256, filename, source_type, app.state.embedder
+            )
+        return response.model_dump()
+    finally:
+        invalidate_knowledge_caches(app)
+        await run_in_threadpool(Path(tmp_path).unlink, missing_ok=True)
+
+
 @app.post("/ingest", response_model=IngestResponse)
 async def ingest_pdf(
+    request: Request,
     file: UploadFile = File(...),
-    source_type: str = Form("textbook")
+    source_type: str = Form("textbook"),
+    embedder: EmbeddingService = Depends(get_embedder)
 ):
     """
     Ingest a PDF file: parse, extract images, generate embeddings, and store.
@@ -360,99 +1028,100 @@ async def ingest_pdf(
     if not db_pool:
         raise HTTPException(status_code=503, detail="Database not available")
     
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    validate_ingest_request(file, source_type)
     
-    # Validate source_type
-    valid_types = ['textbook', 'question', 'exam_paper', 'diagram']
-    if source_type not in valid_types:
+    # Shed load before accepting the upload once enough ingests are waiting
+    state = request.app.state
+    if state.ingest_sem.locked() and state.ingest_waiting >= INGEST_MAX_WAITING:
         raise HTTPException(
-            status_code=400,
-            detail=f"Invalid source_type. Must be one of: {valid_types}"
+            status_code=503,
+            detail="Too many ingestions in progress, retry later",
+            headers={"Retry-After": "30"}
         )
     
-    # Save uploaded file to temp location
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
-        tmp_path = tmp_file.name
+    tmp_path, file_sha256 = await save_upload(file)
     
     try:
-        # Step 1: Parse PDF
-        parser = PDFParser()
-        parsed_data = await parser.parse_pdf(tmp_path)
-        
-        # Step 2: Process images with vision service (optional)
-        images_processed = 0
-        anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-        if parsed_data['images'] and anthropic_key and anthropic_key.startswith('sk-ant-'):
-            try:
-                vision_service = VisionService()
-                descriptions = await vision_service.batch_describe(
-                    parsed_data['images'],
-                    context=f"From {file.filename}"
-                )
-                
-                for idx, desc in enumerate(descriptions):
-                    parsed_data['chunks'].append({
-                        'content': desc,
-                        'metadata': {
-                            'source': 'vision',
-                            'image_index': idx,
-                            'filename': file.filename
-                        }
-                    })
-                images_processed = len(descriptions)
-            except Exception as e:
-                pass
-        
-        # Step 3: Generate embeddings and store
-        for chunk in parsed_data['chunks']:
-            if 'metadata' not in chunk:
-                chunk['metadata'] = {}
-            chunk['metadata']['filename'] = file.filename
-            
-        embedder = EmbeddingService(db_pool)
-        stats = await embedder.process_and_store(
-            parsed_data['chunks'],
-            source_type
-        )
-        
-        # Step 4: If exam_paper, extract and cache style profile
-        if source_type == 'exam_paper' and stats['chunks_stored'] > 0:
-            try:
-                style_analyzer = StyleAnalyzer(db_pool)
-                await style_analyzer.analyze_exam_paper(file.filename)
-            except Exception as e:
-                print(f"Style analysis skipped: {e}")
-        
-        # Step 5: If textbook, extract and store topics
-        topics_extracted = 0
-        if source_type == 'textbook' and stats['chunks_stored'] > 0:
-            try:
-                topic_extractor = TopicExtractor(db_pool)
-                extracted_topics = await topic_extractor.extract_and_store(file.filename)
-                topics_extracted = len(extracted_topics)
-                print(f"✓ Extracted {topics_extracted} topics from {file.filename}")
-            except Exception as e:
-                print(f"Topic extraction skipped: {e}")
-        
-        return IngestResponse(
-            chunks_processed=stats['chunks_stored'],
-            embeddings_created=stats['embeddings_generated'],
-            images_processed=images_processed,
-            topics_extracted=topics_extracted,
-            message=f"Successfully ingested {file.filename} as {source_type}"
-        )
-        
+        state.ingest_waiting += 1
+        try:
+            await state.ingest_sem.acquire()
+        finally:
+            state.ingest_waiting -= 1
+        try:
+            return await run_ingest_pipeline(
+                tmp_path, file_sha256, file.filename, source_type, embedder
+            )
+        finally:
+            state.ingest_sem.release()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
     finally:
-        Path(tmp_path).unlink(missing_ok=True)
+        # Chunks may have been stored even if a later step failed
+        invalidate_knowledge_caches(request.app)
+        await run_in_threadpool(Path(tmp_path).unlink, missing_ok=True)
+
+
+@app.post("/ingest/async", response_model=IngestJobResponse, status_code=202)
+async def ingest_pdf_async(
+    request: Request,
+    file: UploadFile = File(...),
+    source_type: str = Form("textbook"),
+    embedder: EmbeddingService = Depends(get_embedder)
+):
+    """
+    Queue a PDF for background ingestion and return immediately.
+    
+    Poll /ingest/status/{job_id} for the result. Returns 503 when the
+    ingestion backlog is full.
+    
+    Args:
+        file: PDF file to ingest
+        source_type: Type of content ('textbook', 'question', 'exam_paper', or 'diagram')
+    """
+    if not db_pool:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    validate_ingest_request(file, source_type)
+    tmp_path, file_sha256 = await save_upload(file)
+    
+    try:
+        job_id = request.app.state.ingest_queue.submit(
+            tmp_path=tmp_path,
+            file_sha256=file_sha256,
+            filename=file.filename,
+            source_type=source_type
+        )
+    except asyncio.QueueFull:
+        await run_in_threadpool(Path(tmp_path).unlink, missing_ok=True)
+        raise HTTPException(
+            status_code=503,
+            detail="Ingestion queue is full, retry later",
+            headers={"Retry-After": "30"}
+        )
+    
+    return IngestJobResponse(job_id=job_id, status="queued")
+
+
+@app.get("/ingest/status/{job_id}", response_model=IngestJobStatus)
+async def ingest_status(job_id: str, request: Request):
+    """
+    Get the status of a queued ingestion job.
+    
+    Status is one of queued, running, completed or failed. Finished jobs
+    expire after INGEST_RESULT_TTL seconds.
+    """
+    job = request.app.state.ingest_queue.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return IngestJobStatus(**job)
 
 
 @app.post("/generate", response_model=List[QuestionResponse])
-async def generate_questions(request: QuestionRequest):
+async def generate_questions(
+    request: QuestionRequest,
+    rag_engine: MultiAgentRAGEngine = Depends(get_rag_engine)
+):
     """
     Generate exam questions using the Multi-Agent RAG pipeline.
     
@@ -471,18 +1140,7 @@ async def generate_questions(request: QuestionRequest):
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
-        embedder = EmbeddingService(db_pool)
-        rag_engine = MultiAgentRAGEngine(
-            db_pool,
-            embedder,
-            similarity_threshold=float(os.getenv("SIMILARITY_THRESHOLD", "0.85"))
-        )
-        
-        questions = await rag_engine.generate_questions(
-            topics=request.topics,
-            count=request.count,
-            difficulty=request.difficulty
-        )
+        questions = await run_generation(request, rag_engine)
         
         if not questions:
             raise HTTPException(
@@ -490,8 +1148,12 @@ async def generate_questions(request: QuestionRequest):
                 detail=f"Could not generate questions for topic: {request.topic}"
             )
         
-        # Return in original format (strip multi-agent metadata)
-        return [QuestionResponse(**q) for q in questions]
+        # Engine output is already in response shape; project to the original
+        # fields and skip response_model revalidation
+        return ORJSONResponse([
+            {field: q[field] for field in QUESTION_RESPONSE_FIELDS}
+            for q in questions
+        ])
         
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -500,7 +1162,10 @@ async def generate_questions(request: QuestionRequest):
 
 
 @app.post("/generate/v2", response_model=List[QuestionResponseV2])
-async def generate_questions_v2(request: QuestionRequest):
+async def generate_questions_v2(
+    request: QuestionRequest,
+    rag_engine: MultiAgentRAGEngine = Depends(get_rag_engine)
+):
     """
     Generate exam questions with full multi-agent metadata.
     
@@ -521,18 +1186,49 @@ async def generate_questions_v2(request: QuestionRequest):
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
-        embedder = EmbeddingService(db_pool)
-        rag_engine = MultiAgentRAGEngine(
-            db_pool,
-            embedder,
-            similarity_threshold=float(os.getenv("SIMILARITY_THRESHOLD", "0.85"))
-        )
+        questions = await run_generation(request, rag_engine)
         
-        questions = await rag_engine.generate_questions(
-            topics=request.topics,
-            count=request.count,
-            difficulty=request.difficulty
-        )
+        if not questions:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Could not generate questions for topic: {request.topic}"
+            )
+        
+        # One validation pass over the whole list with the prebuilt adapter;
+        # returning a Response skips FastAPI's own response_model pass
+        validated = QUESTION_V2_LIST.validate_python(questions)
+        return ORJSONResponse(QUESTION_V2_LIST.dump_python(validated, mode="json"))
+        
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
+
+
+@app.post("/generate/batch", response_model=QuestionBatchResponse)
+async def generate_questions_batch(
+    request: QuestionRequest,
+    rag_engine: MultiAgentRAGEngine = Depends(get_rag_engine)
+):
+    """
+    Generate exam questions with full metadata in a columnar layout.
+    
+    Same content as /generate/v2, but each field is a parallel array
+    instead of repeating every key per question, which keeps large
+    batches noticeably smaller on the wire. Rebuild question i from
+    index i of each list.
+    
+    Args:
+        request: Question generation parameters
+        
+    Returns:
+        Column-oriented batch of generated questions
+    """
+    if not db_pool:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        questions = await run_generation(request, rag_engine)
         
         if not questions:
             raise HTTPException(
@@ -540,7 +1236,23 @@ async def generate_questions_v2(request: QuestionRequest):
                 detail=f"Could not generate questions for topic: {request.topic}"
             )
         
-        return [QuestionResponseV2(**q) for q in questions]
+        return QuestionBatchResponse(
+            topics=request.topics,
+            difficulty=request.difficulty,
+            count=len(questions),
+            questions=[q['question'] for q in questions],
+            question_types=[q['question_type'] for q in questions],
+            options=[q['options'] for q in questions],
+            answers=[q['answer'] for q in questions],
+            explanations=[q['explanation'] for q in questions],
+            difficulties=[q['difficulty'] for q in questions],
+            question_topics=[q['topic'] for q in questions],
+            cognitive_levels=[q['cognitive_level'] for q in questions],
+            quality_scores=[q['quality_score'] for q in questions],
+            distractor_reasoning=[q['distractor_reasoning'] for q in questions],
+            quality_checks=[q['quality_checks'] for q in questions],
+            source_references=[q['source_references'] for q in questions]
+        )
         
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -549,7 +1261,10 @@ async def generate_questions_v2(request: QuestionRequest):
 
 
 @app.post("/generate/exam-format", response_model=List[QuestionResponseExamSystem])
-async def generate_questions_exam_format(request: QuestionRequest):
+async def generate_questions_exam_format(
+    request: QuestionRequest,
+    rag_engine: MultiAgentRAGEngine = Depends(get_rag_engine)
+):
     """
     Generate exam questions in the specific format required for the exam system upload.
     
@@ -569,19 +1284,8 @@ async def generate_questions_exam_format(request: QuestionRequest):
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
-        embedder = EmbeddingService(db_pool)
-        rag_engine = MultiAgentRAGEngine(
-            db_pool,
-            embedder,
-            similarity_threshold=float(os.getenv("SIMILARITY_THRESHOLD", "0.85"))
-        )
-        
         # Use v2 generation to get full metadata including topic/domain
-        questions = await rag_engine.generate_questions(
-            topics=request.topics,
-            count=request.count,
-            difficulty=request.difficulty
-        )
+        questions = await run_generation(request, rag_engine)
         
         if not questions:
             raise HTTPException(
@@ -637,7 +1341,10 @@ async def generate_questions_exam_format(request: QuestionRequest):
 
 
 @app.get("/analyze-style/{filename}", response_model=AnalysisResult)
-async def analyze_style_profile(filename: str):
+async def analyze_style_profile(
+    filename: str,
+    style_analyzer: StyleAnalyzer = Depends(get_style_analyzer)
+):
     """
     Analyze an exam paper to extract its style profile.
     
@@ -655,7 +1362,6 @@ async def analyze_style_profile(filename: str):
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
-        style_analyzer = StyleAnalyzer(db_pool)
         profile = await style_analyzer.analyze_exam_paper(filename, [filename])
         
         return AnalysisResult(
@@ -671,7 +1377,10 @@ async def analyze_style_profile(filename: str):
 
 
 @app.post("/export-pdf")
-async def export_pdf(request: ExportRequest):
+async def export_pdf(
+    request: ExportRequest,
+    exporter: PDFExporter = Depends(get_pdf_exporter)
+):
     """
     Generate PDF file from provided questions.
     
@@ -684,14 +1393,29 @@ async def export_pdf(request: ExportRequest):
     - PDF file download
     """
     try:
-        exporter = PDFExporter()
-        pdf_buffer = exporter.generate_pdf(request.questions, request.topic, request.difficulty)
+        # reportlab renders synchronously; keep it off the event loop. Small
+        # documents stay in memory, large ones spill to disk, and either way
+        # the file is streamed out in chunks rather than copied into one
+        # response body
+        pdf_file = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_BYTES)
+        try:
+            await run_in_threadpool(
+                exporter.generate_pdf,
+                request.questions,
+                request.topic,
+                request.difficulty,
+                pdf_file
+            )
+        except BaseException:
+            pdf_file.close()
+            raise
         
-        filename = f"{request.topic.replace(' ', '_')}_questions.pdf"
+        filename = f"{UNSAFE_FILENAME_RE.sub('_', request.topic)}_questions.pdf"
         return StreamingResponse(
-            pdf_buffer,
+            iter(lambda: pdf_file.read(PDF_STREAM_CHUNK_BYTES), b""),
             media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+            background=BackgroundTask(pdf_file.close)
         )
         
     except ValueError as e:
@@ -701,7 +1425,10 @@ async def export_pdf(request: ExportRequest):
 
 
 @app.post("/generate/stream")
-async def generate_questions_stream(request: QuestionRequest):
+async def generate_questions_stream(
+    request: QuestionRequest,
+    rag_engine: MultiAgentRAGEngine = Depends(get_rag_engine)
+):
     """
     Generate exam questions with real-time progress streaming using SSE.
     
@@ -716,32 +1443,8 @@ async def generate_questions_stream(request: QuestionRequest):
 
     async def event_generator():
         try:
-            embedder = EmbeddingService(db_pool)
-            rag_engine = MultiAgentRAGEngine(
-                db_pool,
-                embedder,
-                similarity_threshold=float(os.getenv("SIMILARITY_THRESHOLD", "0.85"))
-            )
-            
-            # Progress callback to report to stream
-            async def progress_callback(stage: str, message: str):
-                event = {
-                    "type": "progress",
-                    "stage": stage,
-                    "message": message
-                }
-                yield f"data: {json.dumps(event)}\n\n"
-
-            # Generate questions
-            # Note: We need to iterate over the generator if generate_questions was a generator,
-            # but here we are passing a callback to a regular async function.
-            # To bridge the callback (which yields) with this generator, we need a different approach 
-            # OR we can just rely on the fact that we can't easily yield from within the callback 
-            # if the callback is just awaited.
-            
-            # Wait, the callback *cannot* yield to the outer generator directly.
-            # I need to use an asyncio.Queue to bridge the callback and the generator.
-            
+            # Callbacks run inside the generation task; the queue bridges
+            # their events to this generator
             queue = asyncio.Queue()
             
             async def progress_callback_wrapper(stage: str, message: str):
@@ -753,11 +1456,11 @@ async def generate_questions_stream(request: QuestionRequest):
             
             # Question callback to report to stream
             async def question_callback(question_data: Dict[str, Any]):
-                 # Ensure all fields are present for V2 schema
-                q_obj = QuestionResponseV2(**question_data)
+                # _draft_to_response already emits exactly the V2 fields, so
+                # the dict is forwarded without a validate/dump round-trip
                 event = {
                     "type": "question",
-                    "data": q_obj.model_dump()
+                    "data": question_data
                 }
                 await queue.put(event)
 
@@ -771,24 +1474,25 @@ async def generate_questions_stream(request: QuestionRequest):
                     question_callback=question_callback
                 )
             )
+            # Wake the consumer as soon as generation finishes; every event
+            # queued by the task is ahead of the sentinel
+            task.add_done_callback(lambda _: queue.put_nowait(STREAM_DONE))
             
-            # Consumer loop
-            while not task.done():
-                try:
-                    # Wait for next event or task completion
-                    # We use a timeout to check task status periodically if no events come
-                    event = await asyncio.wait_for(queue.get(), timeout=0.1)
-                    yield f"data: {json.dumps(event)}\n\n"
-                    queue.task_done()
-                except asyncio.TimeoutError:
-                    continue
-                except Exception as e:
-                    error_event = {"type": "error", "message": f"Stream error: {str(e)}"}
-                    yield f"data: {json.dumps(error_event)}\n\n"
+            try:
+                # Consumer loop
+                while True:
+                    event = await queue.get()
+                    if event is STREAM_DONE:
+                        break
+                    yield sse_event(event)
+            finally:
+                # Client disconnected: stop generating questions nobody will read
+                if not task.done():
+                    task.cancel()
             
             # Check for exceptions in the task
             try:
-                questions = await task
+                questions = task.result()
                 if not questions:
                      # Only send error if NO questions were generated and it wasn't a partial success
                      # But generate_questions returns list, so if empty list, then error
@@ -796,26 +1500,21 @@ async def generate_questions_stream(request: QuestionRequest):
                         "type": "error", 
                         "message": f"Could not generate questions for topic: {request.topic}"
                     }
-                    yield f"data: {json.dumps(error_event)}\n\n"
+                    yield sse_event(error_event)
                 else:
                     # Yield done event instead of list
                     done_event = {"type": "done"}
-                    yield f"data: {json.dumps(done_event)}\n\n"
+                    yield sse_event(done_event)
                     
             except Exception as e:
                 error_event = {"type": "error", "message": str(e)}
-                yield f"data: {json.dumps(error_event)}\n\n"
-                
-            # Yield any remaining events in queue
-            while not queue.empty():
-                event = queue.get_nowait()
-                yield f"data: {json.dumps(event)}\n\n"
+                yield sse_event(error_event)
 
         except Exception as e:
             import traceback
             traceback.print_exc()
             error_event = {"type": "error", "message": f"Server Error: {str(e)}"}
-            yield f"data: {json.dumps(error_event)}\n\n"
+            yield sse_event(error_event)
 
     return StreamingResponse(
         event_generator(),
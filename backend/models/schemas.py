@@ -1,5 +1,5 @@
 from typing import Literal, Dict, Any, List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 
@@ -73,6 +73,34 @@ class QuestionResponseV2(BaseModel):
     )
 
 
+class QuestionBatchResponse(BaseModel):
+    """
+    Columnar form of a List[QuestionResponseV2].
+    
+    Values shared by the whole batch are sent once; per-question fields are
+    parallel arrays where index i across every list is question i.
+    """
+    topics: List[str] = Field(..., description="Topics requested for the batch")
+    difficulty: str = Field(..., description="Requested difficulty level")
+    count: int = Field(..., description="Number of questions in the batch")
+    questions: List[str]
+    question_types: List[Literal["single_select", "multiple_selection"]]
+    options: List[Dict[str, str]]
+    answers: List[str]
+    explanations: List[str]
+    difficulties: List[str]
+    question_topics: List[str]
+    cognitive_levels: List[str]
+    quality_scores: List[int]
+    distractor_reasoning: List[List[Dict[str, str]]]
+    quality_checks: List[Dict[str, Dict[str, Any]]]
+    source_references: List[List[str]]
+
+
+# Built once at import so list validation reuses a single compiled schema
+QUESTION_V2_LIST = TypeAdapter(List[QuestionResponseV2])
+
+
 class GenerationMetadata(BaseModel):
     """Metadata about the question generation process"""
     topic: str
@@ -109,6 +137,20 @@ class IngestResponse(BaseModel):
     message: str
 
 
+class IngestJobResponse(BaseModel):
+    """Response model for a queued background ingestion"""
+    job_id: str
+    status: str
+
+
+class IngestJobStatus(BaseModel):
+    """Status of a background ingestion job"""
+    job_id: str
+    status: Literal["queued", "running", "completed", "failed"]
+    result: Optional[IngestResponse] = None
+    error: Optional[str] = None
+
+
 class StyleProfile(BaseModel):
     """Style profile extracted from exam papers"""
     question_stems: List[str] = Field(
@@ -7,14 +7,16 @@ This module implements the three-agent architecture:
 3. Critic: Quality gate with reflection and iteration
 """
 
-from .base_agent import BaseAgent
+from .base_agent import BaseAgent, AgentBackend, close_shared_clients
 from .researcher import ResearcherAgent
 from .psychometrician import PsychometricianAgent
 from .critic import CriticAgent
 
 __all__ = [
     'BaseAgent',
+    'AgentBackend',
     'ResearcherAgent',
     'PsychometricianAgent',
-    'CriticAgent'
+    'CriticAgent',
+    'close_shared_clients'
 ]
\ No newline at end of file
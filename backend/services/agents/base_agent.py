@@ -2,9 +2,220 @@
 Base agent class with shared LLM client and structured output handling.
 """
 import os
-import json
-from typing import Dict, Any, Optional
-from pydantic import BaseModel
+import orjson
+import logging
+import hashlib
+import time
+from collections import OrderedDict
+import random
+import asyncio
+import functools
+from typing import Dict, Any, Optional, Tuple, List, Awaitable
+import httpx
+import tiktoken
+from pydantic import BaseModel, ValidationError
+import openai
+from .rate_limiter import AsyncGCRALimiter
+
+
+logger = logging.getLogger(__name__)
+
+
+class EmptyResponseError(RuntimeError):
+    """The model returned no content for no deterministic reason."""
+
+
+# An empty completion ending for one of these reasons would end the same
+# way again (the output budget ran out, or the request was filtered)
+FINAL_EMPTY_FINISH_REASONS = ("length", "content_filter")
+
+
+# Transient failures worth another attempt; anything else (4xx rejections,
+# programming errors such as TypeError) fails on the first attempt
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+    EmptyResponseError,
+)
+MAX_BACKOFF_SECONDS = 30.0
+# Responses sampled above this temperature are meant to vary, so never cached
+RESPONSE_CACHE_MAX_TEMPERATURE = 0.5
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """
+    Seconds to wait before the next attempt.
+    
+    Honors the server's Retry-After header on rate limits, otherwise uses
+    exponential backoff with jitter.
+    
+    Args:
+        error: Exception raised by the failed attempt
+        attempt: Zero-based attempt number
+        
+    Returns:
+        Delay in seconds
+    """
+    if isinstance(error, openai.RateLimitError):
+        retry_after = error.response.headers.get("retry-after")
+        try:
+            return min(float(retry_after), MAX_BACKOFF_SECONDS)
+        except (TypeError, ValueError):
+            pass
+    return min(2 ** attempt + random.random(), MAX_BACKOFF_SECONDS)
+
+
+@functools.lru_cache(maxsize=64)
+def _response_format_for(model_class: type[BaseModel]) -> Dict[str, Any]:
+    """
+    Build (once per class) the structured-output response_format for a model.
+    
+    Non-strict, because strict schemas reject the free-form Dict fields our
+    models use. Callers must not mutate the returned dict.
+    
+    Args:
+        model_class: Pydantic model class
+        
+    Returns:
+        response_format dict for chat.completions.create
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model_class.__name__,
+            "schema": model_class.model_json_schema(),
+            "strict": False
+        }
+    }
+
+
+@functools.lru_cache(maxsize=16)
+def _encoding_for(model: str) -> tiktoken.Encoding:
+    """
+    Look up (once per model) the tiktoken encoding used for token counts.
+    
+    Args:
+        model: OpenAI model name
+        
+    Returns:
+        tiktoken Encoding (cl100k_base for models tiktoken doesn't know)
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+# One AsyncOpenAI client per (api_key, event loop), shared by every agent and
+# the EmbeddingService so Researcher -> Psychometrician -> Critic hops and
+# embedding calls all reuse the same warm connections
+_clients: Dict[Tuple[str, Optional[str], Optional[int]], Any] = {}
+
+
+def _current_loop_id() -> Optional[int]:
+    """Identify the running event loop (None when called outside one)."""
+    try:
+        return id(asyncio.get_running_loop())
+    except RuntimeError:
+        return None
+
+
+def _get_client(
+    api_key: str,
+    base_url: Optional[str] = None,
+    max_connections: int = 200,
+    max_keepalive_connections: int = 100,
+    keepalive_expiry: float = 30.0,
+    timeout: Optional[httpx.Timeout] = None
+):
+    """
+    Return the shared AsyncOpenAI client for this backend and event loop.
+    
+    The pool settings only apply when the client is first created; later
+    callers reuse the existing pool.
+    
+    Args:
+        api_key: OpenAI API key
+        base_url: API base URL (None = SDK default / OPENAI_BASE_URL)
+        max_connections: Max concurrent HTTP connections to the API
+        max_keepalive_connections: Idle connections kept warm for reuse
+        keepalive_expiry: Seconds an idle connection stays open
+        timeout: HTTP timeouts (default: 10s connect, 120s read, 30s write, 5s pool)
+        
+    Returns:
+        AsyncOpenAI client
+    """
+    key = (api_key, base_url, _current_loop_id())
+    client = _clients.get(key)
+    if client is None:
+        # Concurrent requests are multiplexed over one HTTP/2 connection
+        # instead of each opening (and TLS-handshaking) its own
+        http_client = httpx.AsyncClient(
+            http2=os.getenv("OPENAI_HTTP2", "true").lower() in ("1", "true", "yes"),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            timeout=timeout or httpx.Timeout(connect=10.0, read=120.0, write=30.0, pool=5.0)
+        )
+        # Retries are handled (with backoff) by BaseAgent and EmbeddingService
+        client = openai.AsyncOpenAI(
+            api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0
+        )
+        _clients[key] = client
+    return client
+
+
+# Rate limits are per API key and model, so one limiter is shared by every
+# agent calling the same model with the same key
+_rate_limiters: Dict[Tuple[str, Optional[str], str, Optional[int]], AsyncGCRALimiter] = {}
+
+
+def _get_rate_limiter(
+    api_key: str,
+    base_url: Optional[str],
+    model: str
+) -> AsyncGCRALimiter:
+    """
+    Return the shared rate limiter for this backend, model and event loop.
+    
+    OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT pin the limits; when unset they are
+    learnt from the first response's rate-limit headers.
+    
+    Args:
+        api_key: OpenAI API key
+        base_url: API base URL
+        model: Model the requests are sent to
+        
+    Returns:
+        AsyncGCRALimiter
+    """
+    key = (api_key, base_url, model, _current_loop_id())
+    limiter = _rate_limiters.get(key)
+    if limiter is None:
+        limiter = AsyncGCRALimiter(
+            rpm=int(os.getenv("OPENAI_RPM_LIMIT", "0")) or None,
+            tpm=int(os.getenv("OPENAI_TPM_LIMIT", "0")) or None
+        )
+        _rate_limiters[key] = limiter
+    return limiter
+
+
+async def close_shared_clients() -> None:
+    """Close every shared client created on the running event loop."""
+    loop_id = _current_loop_id()
+    for key in [k for k in _clients if k[2] == loop_id]:
+        await _clients.pop(key).close()
+
+
+class AgentBackend(BaseModel):
+    """One OpenAI-compatible endpoint an agent can send requests to."""
+    api_key: str
+    base_url: Optional[str] = None
+    model: Optional[str] = None  # None = the agent's model
 
 
 class BaseAgent:
@@ -12,17 +223,42 @@ class BaseAgent:
     Base class for all agents in the multi-agent system.
     
     Provides:
-    - Shared Anthropic Claude client
+    - Shared OpenAI client (one connection pool per process and event loop)
     - Structured JSON output parsing
-    - Retry logic for failed API calls
+    - Retry with exponential backoff for transient API errors
+    - Round-robin over several API keys/endpoints, skipping rate-limited ones
     - Common prompt building utilities
+    
+    Subclasses keep their system prompts as module-level constants free of
+    per-call values, and put the per-request parameters at the end of the
+    user prompt. OpenAI caches prompt prefixes, so requests that share the
+    system prompt (and any leading context) reuse it.
     """
     
+    # Per-attempt deadline in seconds; subclasses tune it to their output size
+    request_timeout: float = 60.0
+    # Share one API call between concurrent identical requests. Off by default:
+    # callers such as the Psychometrician rely on sampling to get distinct
+    # outputs from identical prompts. Always on for temperature 0.
+    coalesce_requests: bool = False
+    # Reuse responses to identical low-temperature requests for up to the
+    # cache TTL. Off by default: most prompts embed data that changes (e.g.
+    # the uploaded files), so a cached answer can go stale.
+    cache_responses: bool = False
+    
     def __init__(
         self,
         api_key: Optional[str] = None,
         model: str = "gpt-4o",
-        max_retries: int = 3
+        max_retries: int = 3,
+        max_connections: int = 200,
+        max_keepalive_connections: int = 100,
+        keepalive_expiry: float = 30.0,
+        timeout: Optional[httpx.Timeout] = None,
+        request_timeout: Optional[float] = None,
+        backends: Optional[List[AgentBackend]] = None,
+        response_cache_size: Optional[int] = None,
+        response_cache_ttl: Optional[float] = None
     ):
         """
         Initialize the base agent.
@@ -31,15 +267,77 @@ class BaseAgent:
             api_key: OpenAI API key (defaults to env var)
             model: OpenAI model to use (default: gpt-4o)
             max_retries: Maximum retry attempts for failed calls
+            max_connections: Max concurrent HTTP connections to the API
+            max_keepalive_connections: Idle connections kept warm for reuse
+            keepalive_expiry: Seconds an idle connection stays open
+            timeout: HTTP timeouts (default: 10s connect, 120s read, 30s write, 5s pool)
+            request_timeout: Per-attempt deadline for a completion (default: class value)
+            backends: Endpoints to spread calls over (default: api_key plus any
+                keys in OPENAI_FALLBACK_API_KEYS)
+            response_cache_size: Max cached low-temperature responses when
+                cache_responses is set, 0 disables (defaults to
+                AGENT_RESPONSE_CACHE_SIZE env var)
+            response_cache_ttl: Seconds a cached response stays valid
+                (defaults to AGENT_RESPONSE_CACHE_TTL env var)
+            
+        Pool settings only take effect for the first agent created with a
+        given API key; the rest share its client.
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
+        if not backends and not self.api_key:
             raise ValueError("OpenAI API key not provided")
         
-        from openai import AsyncOpenAI
-        self.client = AsyncOpenAI(api_key=self.api_key)
+        if not backends:
+            fallback_keys = os.getenv("OPENAI_FALLBACK_API_KEYS", "")
+            backends = [AgentBackend(api_key=self.api_key)] + [
+                AgentBackend(api_key=key.strip())
+                for key in fallback_keys.split(",") if key.strip()
+            ]
+        
+        # (backend, client, limiter) per endpoint; each key and model has its
+        # own rate limits, so each gets its own limiter
+        self.backends = [
+            (
+                backend,
+                _get_client(
+                    backend.api_key,
+                    backend.base_url,
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry,
+                    timeout=timeout
+                ),
+                _get_rate_limiter(backend.api_key, backend.base_url, backend.model or model)
+            )
+            for backend in backends
+        ]
+        self._next_backend = 0
+        _, self.client, self.rate_limiter = self.backends[0]
         self.model = model
         self.max_retries = max_retries
+        if request_timeout is not None:
+            self.request_timeout = request_timeout
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
+        # Exact-match cache of responses to identical low-temperature requests
+        self.response_cache_size = (
+            response_cache_size if response_cache_size is not None
+            else int(os.getenv("AGENT_RESPONSE_CACHE_SIZE", "512"))
+        )
+        self.response_cache_ttl = response_cache_ttl or float(os.getenv("AGENT_RESPONSE_CACHE_TTL", "3600"))
+        self._response_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+    
+    def count_tokens(self, text: str) -> int:
+        """
+        Count prompt tokens for rate limiting.
+        
+        Args:
+            text: Prompt text
+            
+        Returns:
+            Number of tokens under the model's encoding
+        """
+        return len(_encoding_for(self.model).encode(text, disallowed_special=()))
     
     async def call(
         self,
@@ -47,7 +345,9 @@ class BaseAgent:
         user_prompt: str,
         temperature: float = 0.7,
         max_tokens: int = 4096,
-        json_mode: bool = True
+        json_mode: bool = True,
+        request_timeout: Optional[float] = None,
+        response_format: Optional[Dict[str, Any]] = None
     ) -> str:
         """
         Call the LLM with the given prompts.
@@ -58,11 +358,101 @@ class BaseAgent:
             temperature: Sampling temperature (0-2)
             max_tokens: Maximum tokens in response
             json_mode: If True, request JSON output (via response_format)
+            request_timeout: Per-attempt deadline in seconds (default: self.request_timeout)
+            response_format: Explicit response_format (overrides json_mode)
             
         Returns:
             Raw response text
         """
+        request_timeout = request_timeout or self.request_timeout
+        coalesce = self.coalesce_requests or temperature == 0
+        cacheable = (
+            self.cache_responses
+            and self.response_cache_size > 0
+            and temperature <= RESPONSE_CACHE_MAX_TEMPERATURE
+        )
+        if not (coalesce or cacheable):
+            return await self._call_uncached(
+                system_prompt, user_prompt, temperature, max_tokens,
+                json_mode, request_timeout, response_format
+            )
+        
+        format_name = (
+            response_format.get("json_schema", {}).get("name", response_format.get("type"))
+            if response_format else json_mode
+        )
+        key = hashlib.blake2b(
+            f"{self.model}\0{temperature}\0{max_tokens}\0{format_name}\0"
+            f"{system_prompt}\0{user_prompt}".encode(),
+            digest_size=16
+        ).hexdigest()
+        
+        if cacheable:
+            cached = self._response_cache_get(key)
+            if cached is not None:
+                return cached
+        
+        if coalesce:
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._call_uncached(
+                    system_prompt, user_prompt, temperature, max_tokens,
+                    json_mode, request_timeout, response_format
+                ))
+                self._inflight[key] = task
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            
+            # Shielded so one waiter being cancelled doesn't fail the others
+            content = await asyncio.shield(task)
+        else:
+            content = await self._call_uncached(
+                system_prompt, user_prompt, temperature, max_tokens,
+                json_mode, request_timeout, response_format
+            )
+        
+        if cacheable:
+            self._response_cache_put(key, content)
+        return content
+    
+    def _response_cache_get(self, key: str) -> Optional[str]:
+        """Look up an unexpired cached response."""
+        entry = self._response_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, content = entry
+        if expires_at < time.monotonic():
+            del self._response_cache[key]
+            return None
+        self._response_cache.move_to_end(key)
+        return content
+    
+    def _response_cache_put(self, key: str, content: str) -> None:
+        """Cache a response, evicting the least recently used entry."""
+        self._response_cache[key] = (time.monotonic() + self.response_cache_ttl, content)
+        self._response_cache.move_to_end(key)
+        if len(self._response_cache) > self.response_cache_size:
+            self._response_cache.popitem(last=False)
+    
+    async def _call_uncached(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool,
+        request_timeout: float,
+        response_format: Optional[Dict[str, Any]]
+    ) -> str:
+        """Make the API call with rate limiting, timeout and retries (see call)."""
+        # OpenAI counts max_tokens against the TPM budget up front
+        estimated_tokens = self.count_tokens(system_prompt + user_prompt) + max_tokens
+        # Backends skipped in a row after rate limiting, without sleeping
+        rate_limited = 0
+        
         for attempt in range(self.max_retries):
+            # Round-robin across backends so N keys give ~N x the rate limit
+            backend, client, rate_limiter = self.backends[self._next_backend]
+            self._next_backend = (self._next_backend + 1) % len(self.backends)
             try:
                 messages = [
                     {"role": "system", "content": system_prompt},
@@ -70,26 +460,65 @@ class BaseAgent:
                 ]
                 
                 kwargs = {
-                    "model": self.model,
+                    "model": backend.model or self.model,
                     "messages": messages,
                     "temperature": temperature,
-                    "max_tokens": max_tokens
+                    "max_completion_tokens": max_tokens
                 }
                 
-                if json_mode:
+                if response_format:
+                    kwargs["response_format"] = response_format
+                elif json_mode:
                     kwargs["response_format"] = {"type": "json_object"}
                 
-                response = await self.client.chat.completions.create(**kwargs)
+                await rate_limiter.acquire(estimated_tokens)
                 
-                return response.choices[0].message.content
+                # Cut off slow-tail responses and retry rather than waiting
+                # out the full HTTP read timeout
+                raw_response = await asyncio.wait_for(
+                    client.chat.completions.with_raw_response.create(**kwargs),
+                    timeout=request_timeout
+                )
+                rate_limiter.update_from_headers(raw_response.headers)
+                response = raw_response.parse()
                 
-            except Exception as e:
+                content = response.choices[0].message.content
+                if not content:
+                    finish_reason = response.choices[0].finish_reason
+                    if finish_reason in FINAL_EMPTY_FINISH_REASONS:
+                        raise RuntimeError(
+                            f"LLM returned no content (finish_reason={finish_reason})"
+                        )
+                    raise EmptyResponseError(f"empty response (finish_reason={finish_reason})")
+                return content
+                
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    e = TimeoutError(f"no response within {request_timeout:.0f}s")
                 if attempt == self.max_retries - 1:
                     raise RuntimeError(
                         f"Failed to call LLM after {self.max_retries} attempts: {str(e)}"
                     )
-                print(f"  Retry {attempt + 1}/{self.max_retries}: {e}")
-                continue
+                if isinstance(e, openai.RateLimitError) and rate_limited < len(self.backends) - 1:
+                    # Another backend has its own quota; try it straight away,
+                    # backing off only once every backend has been throttled
+                    rate_limited += 1
+                    logger.warning(
+                        "Retry %d/%d on next backend: %s", attempt + 1, self.max_retries, e
+                    )
+                    continue
+                rate_limited = 0
+                delay = _retry_delay(e, attempt)
+                # Lazy %-formatting: nothing is built when WARNING is disabled,
+                # and no stdout lock is taken during retry storms
+                logger.warning(
+                    "Retry %d/%d in %.1fs: %s", attempt + 1, self.max_retries, delay, e
+                )
+                await asyncio.sleep(delay)
+                
+            except openai.APIStatusError as e:
+                # 4xx rejections (bad request, auth, not found) fail the same way every time
+                raise RuntimeError(f"LLM request rejected: {str(e)}")
     
     async def call_with_json(
         self,
@@ -110,32 +539,34 @@ class BaseAgent:
         Returns:
             Parsed JSON dict
         """
-        # Add JSON instruction to user prompt
-        json_instruction = "\n\nIMPORTANT: Return ONLY valid JSON, no other text."
-        full_user_prompt = user_prompt + json_instruction
-        
+        # response_format=json_object already constrains the output (every
+        # caller's prompt mentions JSON, as that mode requires)
         response_text = await self.call(
             system_prompt=system_prompt,
-            user_prompt=full_user_prompt,
+            user_prompt=user_prompt,
             temperature=temperature,
             max_tokens=max_tokens
         )
         
-        # Parse JSON response
+        # Fast path: JSON mode returns bare JSON
+        try:
+            return orjson.loads(response_text)
+        except orjson.JSONDecodeError:
+            pass
+        
+        # Fall back to extracting JSON from a code block
         try:
-            # Try to extract JSON if there's extra text
             response_text = response_text.strip()
             if response_text.startswith("```"):
-                # Extract from code block
                 lines = response_text.split("```")
                 for line in lines:
                     if line.strip().startswith("{") or line.strip().startswith("["):
                         response_text = line.strip()
                         break
             
-            return json.loads(response_text)
+            return orjson.loads(response_text)
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             raise RuntimeError(
                 f"Failed to parse JSON response: {str(e)}\n"
                 f"Response was: {response_text[:500]}..."
@@ -162,21 +593,49 @@ class BaseAgent:
         Returns:
             Instance of the Pydantic model
         """
-        # Add schema instruction to system prompt
-        schema_instruction = (
-            "\n\nReturn a JSON object that matches this schema:\n"
-            f"{json.dumps(model_class.model_json_schema(), indent=2)}"
-        )
-        full_system_prompt = system_prompt + schema_instruction
-        
-        response_dict = await self.call_with_json(
-            system_prompt=full_system_prompt,
+        # Send the schema as a structured-output response_format rather than
+        # pasting it into the prompt
+        response_text = await self.call(
+            system_prompt=system_prompt,
             user_prompt=user_prompt,
             temperature=temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            response_format=_response_format_for(model_class)
         )
         
-        return model_class(**response_dict)
+        try:
+            return model_class.model_validate_json(response_text)
+        except ValidationError as e:
+            raise RuntimeError(
+                f"Response did not match {model_class.__name__}: {str(e)}\n"
+                f"Response was: {response_text[:500]}..."
+            )
+    
+    async def gather_limited(
+        self,
+        coros: List[Awaitable[Any]],
+        concurrency: int = 8
+    ) -> List[Any]:
+        """
+        Run agent calls concurrently with at most `concurrency` in flight.
+        
+        Failures are returned in place of results so one bad item does not
+        cancel its siblings.
+        
+        Args:
+            coros: Awaitables to run
+            concurrency: Maximum number of simultaneous calls
+            
+        Returns:
+            Results (or exceptions) in the same order as `coros`
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def run(coro):
+            async with semaphore:
+                return await coro
+        
+        return await asyncio.gather(*(run(c) for c in coros), return_exceptions=True)
     
     def format_context_chunks(
         self,
@@ -201,14 +660,14 @@ class BaseAgent:
         if not chunks:
             return f"{label}: No context available"
         
-        formatted = f"{label}:\n\n"
+        # Collect lines and join once; repeated += is quadratic in context size
+        parts = [f"{label}:", ""]
         for i, chunk in enumerate(chunks, 1):
-            content = chunk.get('content', '')
-            metadata = chunk.get('metadata', {})
-            
-            formatted += f"{label} {i}:\n{content}\n"
+            parts.append(f"{label} {i}:")
+            parts.append(chunk.get('content', ''))
             
             # Add source info if available
+            metadata = chunk.get('metadata')
             if metadata:
                 source_info = []
                 if 'filename' in metadata:
@@ -216,8 +675,8 @@ class BaseAgent:
                 if 'source_page' in metadata:
                     source_info.append(f"Page: {metadata['source_page']}")
                 if source_info:
-                    formatted += f"  [{', '.join(source_info)}]\n"
+                    parts.append(f"  [{', '.join(source_info)}]")
             
-            formatted += "\n"
+            parts.append("")
         
-        return formatted
\ No newline at end of file
+        return "\n".join(parts) + "\n"
\ No newline at end of file
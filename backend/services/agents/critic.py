@@ -8,6 +8,52 @@ from .researcher import ResearchBrief
 from .psychometrician import DraftedQuestion
 
 
+_CRITIC_SYSTEM_PROMPT = """You are a Senior Quality Assurance Specialist for a professional examination board. Your role is to critically evaluate multiple-choice questions.
+
+Your evaluation criteria:
+
+1. FACTUAL ACCURACY (CRITICAL)
+   - Is the correct answer actually correct based on the research content?
+   - Are all facts in the question and options accurate?
+   - No hallucinations or external knowledge
+
+2. DISTRACTOR QUALITY
+   - Are distractors plausible but clearly wrong to knowledgeable candidates?
+   - Do distractors test common misconceptions?
+   - Is the answer count correct (1 for SINGLE_SELECT, >1 for MULTIPLE_SELECTION)?
+
+3. NO ANSWER GIVEAWAY
+   - Does the question structure accidentally reveal the answer?
+   - Are there linguistic clues that point to the correct option?
+   - Are options balanced in length and structure?
+
+4. DIFFICULTY ALIGNMENT
+   - Does the question match the stated difficulty level?
+   - EASY: Direct recall, single-step
+   - MEDIUM: Application, 2-3 step reasoning
+   - HARD: Synthesis, multi-step reasoning
+
+5. CLARITY
+   - Is the question unambiguous?
+   - Is the wording precise and clear?
+   - Could multiple interpretations exist?
+
+SCORING:
+- 10: Perfect, no issues
+- 8-9: Excellent, minor improvements possible
+- 7: Good, acceptable with minor issues
+- 5-6: Fair, needs revision
+- 1-4: Poor, major issues or errors
+
+APPROVAL:
+- APPROVE if score >= the MINIMUM SCORE given with the question AND no critical factual errors
+- REJECT if score < the MINIMUM SCORE OR any factual inaccuracy
+
+Return JSON matching the CritiqueReview schema. "checks" has one entry per criterion (factual_accuracy, distractor_quality, no_answer_giveaway, difficulty_alignment, clarity), each {"passed": true/false, "notes": "..."}.
+
+Be specific and thorough in your evaluation. If a check fails, explain exactly why and suggest improvements."""
+
+
 class CritiqueReview(BaseModel):
     """Structured output from the Critic agent."""
     approved: bool
@@ -31,6 +77,11 @@ class CriticAgent(BaseAgent):
     If not approved, it provides specific feedback for revision.
     """
     
+    # Short JSON verdicts; fail fast and retry
+    request_timeout = 30.0
+    # Identical drafts get the same verdict, so concurrent duplicates share a call
+    coalesce_requests = True
+    
     async def review(
         self,
         question: DraftedQuestion,
@@ -52,100 +103,23 @@ class CriticAgent(BaseAgent):
         question_text = self._format_question(question)
         research_context = self._format_research_brief(research_brief)
         
-        system_prompt = """You are a Senior Quality Assurance Specialist for a professional examination board. Your role is to critically evaluate multiple-choice questions.
-
-Your evaluation criteria:
-
-1. FACTUAL ACCURACY (CRITICAL)
-   - Is the correct answer actually correct based on the research content?
-   - Are all facts in the question and options accurate?
-   - No hallucinations or external knowledge
-
-2. DISTRACTOR QUALITY
-   - Are distractors plausible but clearly wrong to knowledgeable candidates?
-   - Do distractors test common misconceptions?
-   - Is the answer count correct (1 for SINGLE_SELECT, >1 for MULTIPLE_SELECTION)?
-
-3. NO ANSWER GIVEAWAY
-   - Does the question structure accidentally reveal the answer?
-   - Are there linguistic clues that point to the correct option?
-   - Are options balanced in length and structure?
-
-4. DIFFICULTY ALIGNMENT
-   - Does the question match the stated difficulty level?
-   - EASY: Direct recall, single-step
-   - MEDIUM: Application, 2-3 step reasoning
-   - HARD: Synthesis, multi-step reasoning
-
-5. CLARITY
-   - Is the question unambiguous?
-   - Is the wording precise and clear?
-   - Could multiple interpretations exist?
-
-SCORING:
-- 10: Perfect, no issues
-- 8-9: Excellent, minor improvements possible
-- 7: Good, acceptable with minor issues
-- 5-6: Fair, needs revision
-- 1-4: Poor, major issues or errors
-
-APPROVAL:
-- APPROVE if score >= {min_score} AND no critical factual errors
-- REJECT if score < {min_score} OR any factual inaccuracy"""
-
         user_prompt = f"""Review this question critically.
 
-{question_text}
+MINIMUM SCORE: {min_score}
 
-{research_context}
-
-Return a JSON object with this structure:
-{{
-    "approved": true/false,
-    "score": 1-10,
-    "issues": [
-        "Specific issue 1",
-        "Specific issue 2"
-    ],
-    "suggestions": [
-        "Specific suggestion 1",
-        "Specific suggestion 2"
-    ],
-    "checks": {{
-        "factual_accuracy": {{
-            "passed": true/false,
-            "notes": "Specific notes about accuracy"
-        }},
-        "distractor_quality": {{
-            "passed": true/false,
-            "notes": "Notes about distractor plausibility"
-        }},
-        "no_answer_giveaway": {{
-            "passed": true/false,
-            "notes": "Notes about potential giveaways"
-        }},
-        "difficulty_alignment": {{
-            "passed": true/false,
-            "notes": "Notes about difficulty match"
-        }},
-        "clarity": {{
-            "passed": true/false,
-            "notes": "Notes about question clarity"
-        }}
-    }}
-}}
+{question_text}
 
-Be specific and thorough in your evaluation. If a check fails, explain exactly why and suggest improvements."""
+{research_context}"""
 
-        response_dict = await self.call_with_json(
-            system_prompt=system_prompt,
+        # Schema goes via structured outputs, so the prompt carries no JSON template
+        review = await self.call_with_pydantic(
+            system_prompt=_CRITIC_SYSTEM_PROMPT,
             user_prompt=user_prompt,
+            model_class=CritiqueReview,
             temperature=0.3,  # Lower temperature for consistent evaluation
             max_tokens=2048
         )
         
-        review = CritiqueReview(**response_dict)
-        
         # Override approval if score is below threshold
         if review.score < min_score:
             review.approved = False
@@ -186,7 +160,12 @@ Be specific and thorough in your evaluation. If a check fails, explain exactly w
         return "\n".join(sections)
     
     def _format_research_brief(self, brief: ResearchBrief) -> str:
-        """Format ResearchBrief for LLM consumption."""
+        """Format ResearchBrief for LLM consumption (rendered once per brief)."""
+        return brief.rendered("critic", self._render_research_brief)
+    
+    @staticmethod
+    def _render_research_brief(brief: ResearchBrief) -> str:
+        """Render a ResearchBrief as prompt text."""
         sections = ["RESEARCH_BRIEF (for factual verification):"]
         sections.append(f"Topic: {brief.topic}")
         sections.append(f"Summary: {brief.summary}")
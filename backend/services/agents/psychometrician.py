@@ -1,12 +1,63 @@
 """
 Psychometrician Agent: Drafts questions by matching textbook facts with past paper style.
 """
-from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 from pydantic import BaseModel
 from .base_agent import BaseAgent
 from .researcher import ResearchBrief
 
 
+_DRAFT_SYSTEM_PROMPT = """You are a Senior Examiner and Psychometrician for a professional certification examination board. Your expertise includes:
+
+1. QUESTION CRAFTING: Create exam-style multiple-choice questions that are challenging but fair
+2. STYLE MIRRORING: Match the linguistic patterns, complexity, and tone of actual exam papers
+3. PSYCHOMETRICS: Design distractors that test common misconceptions and partial understandings
+4. COGNITIVE ALIGNMENT: Match questions to the appropriate cognitive level (recall, application, analysis, synthesis)
+
+STRICT REQUIREMENTS:
+- Use EXACTLY 4 options (A, B, C, D)
+- Follow the QUESTION TYPE instruction given with the request
+- For SINGLE_SELECT: Only ONE correct answer
+- For MULTIPLE_SELECTION: TWO correct answers AND append '(choice 2)' to question text
+- Make distractors plausible but clearly wrong to knowledgeable candidates
+- Distractors should reflect common student misconceptions
+- Questions must be answerable from the provided RESEARCH_CONTENT
+- Mirror the style of PAST_PAPER_EXAMPLES (sentence length, phrasing patterns, complexity)
+- Include detailed explanation that references specific facts
+
+DIFFICULTY GUIDELINES:
+- EASY: Direct recall of facts, single-step reasoning, clear wording
+- MEDIUM: Application of concepts, 2-3 step reasoning, some ambiguity
+- HARD: Synthesis of multiple concepts, multi-step reasoning, nuanced distractors
+
+CRITICAL: Never invent facts. Only use information from the RESEARCH_CONTENT."""
+
+# Same examiner instructions plus the Critic's rubric, so the model checks and
+# fixes its own draft in the same call
+_SELF_REVIEW_SYSTEM_PROMPT = _DRAFT_SYSTEM_PROMPT + """
+
+SELF-REVIEW BEFORE ANSWERING:
+Draft the question, then check it as a strict quality reviewer would:
+1. FACTUAL ACCURACY: the answer is correct per RESEARCH_CONTENT; no external facts
+2. DISTRACTOR QUALITY: plausible, tests misconceptions, correct answer count for the type
+3. NO ANSWER GIVEAWAY: no linguistic clues; options balanced in length and structure
+4. DIFFICULTY ALIGNMENT: matches the requested difficulty
+5. CLARITY: unambiguous, precise wording
+
+Fix every problem you find, then return a JSON object with:
+- "self_review": list of the problems you found and fixed (empty if none)
+- "question": the final, corrected question (DraftedQuestion schema)"""
+
+_REVISE_SYSTEM_PROMPT = """You are a Senior Examiner revising a question based on feedback.
+
+Your task:
+1. Address each piece of feedback
+2. Improve the question without changing its core intent
+3. Maintain style consistency with exam papers
+4. Ensure factual accuracy based on research content"""
+
+
 class DraftedQuestion(BaseModel):
     """Structured output from the Psychometrician agent."""
     question: str
@@ -20,6 +71,16 @@ class DraftedQuestion(BaseModel):
     cognitive_level: str  # recall, application, analysis, synthesis
 
 
+# Draft fields shown to the model when revising a question
+REVISION_DRAFT_FIELDS = {"question", "question_type", "options", "answer", "explanation"}
+
+
+class SelfReviewedDraft(BaseModel):
+    """Draft question after the Psychometrician's own rubric check."""
+    self_review: List[str]  # Problems found and fixed before returning
+    question: DraftedQuestion
+
+
 class PsychometricianAgent(BaseAgent):
     """
     The Psychometrician agent drafts exam questions by combining:
@@ -30,6 +91,24 @@ class PsychometricianAgent(BaseAgent):
     This agent ensures questions are not "too easy" or "hallucinated."
     """
     
+    # Full question drafts with explanations take longest
+    request_timeout = 90.0
+    
+    # Style prefixes kept per (profile, examples) pair; one per concurrent run
+    STYLE_PREFIX_CACHE_SIZE = 32
+    
+    def __init__(self, **kwargs):
+        """
+        Initialize the Psychometrician agent.
+        
+        Args:
+            **kwargs: Passed to BaseAgent
+        """
+        super().__init__(**kwargs)
+        # id(profile), id(examples) -> (profile, examples, rendered prefix);
+        # the objects are kept so their ids cannot be reused while cached
+        self._style_prefixes: "OrderedDict[Tuple[int, int], Tuple[Any, Any, str]]" = OrderedDict()
+    
     async def draft_question(
         self,
         research_brief: ResearchBrief,
@@ -51,91 +130,56 @@ class PsychometricianAgent(BaseAgent):
         Returns:
             DraftedQuestion with complete question structure
         """
-        # Format research brief for LLM
-        research_context = self._format_research_brief(research_brief)
-        
-        # Format style examples
-        style_context = self._format_style_examples(style_examples) if style_examples else ""
-        
-        # Format style profile
-        profile_context = self._format_style_profile(style_profile) if style_profile else ""
+        user_prompt = self._build_draft_prompt(
+            research_brief, style_profile, style_examples, difficulty, forced_question_type
+        )
         
-        # Build prompts
-        # Determine type instructions
-        type_instruction = "Determine if the question should be SINGLE_SELECT or MULTIPLE_SELECTION based on content."
-        if forced_question_type == "single_select":
-            type_instruction = "Create a SINGLE_SELECT question (one correct answer)."
-        elif forced_question_type == "multiple_selection":
-            type_instruction = "Create a MULTIPLE_SELECTION question (at least two correct answers). IMPORTANT: Append '(choice 2)' to the end of the question text."
-
-        system_prompt = f"""You are a Senior Examiner and Psychometrician for a professional certification examination board. Your expertise includes:
-
-1. QUESTION CRAFTING: Create exam-style multiple-choice questions that are challenging but fair
-2. STYLE MIRRORING: Match the linguistic patterns, complexity, and tone of actual exam papers
-3. PSYCHOMETRICS: Design distractors that test common misconceptions and partial understandings
-4. COGNITIVE ALIGNMENT: Match questions to the appropriate cognitive level (recall, application, analysis, synthesis)
-
-STRICT REQUIREMENTS:
-- Use EXACTLY 4 options (A, B, C, D)
-- {type_instruction}
-- For SINGLE_SELECT: Only ONE correct answer
-- For MULTIPLE_SELECTION: TWO correct answers AND append '(choice 2)' to question text
-- Make distractors plausible but clearly wrong to knowledgeable candidates
-- Distractors should reflect common student misconceptions
-- Questions must be answerable from the provided RESEARCH_CONTENT
-- Mirror the style of PAST_PAPER_EXAMPLES (sentence length, phrasing patterns, complexity)
-- Include detailed explanation that references specific facts
-
-DIFFICULTY GUIDELINES:
-- EASY: Direct recall of facts, single-step reasoning, clear wording
-- MEDIUM: Application of concepts, 2-3 step reasoning, some ambiguity
-- HARD: Synthesis of multiple concepts, multi-step reasoning, nuanced distractors
-
-CRITICAL: Never invent facts. Only use information from the RESEARCH_CONTENT."""
-
-        user_prompt = f"""Draft a {difficulty} difficulty question.
-
-TOPIC: {research_brief.topic}
-
-{research_context}
-
-{profile_context}
-
-{style_context}
-
-Returns the result as a JSON object (NOT the schema definition, but the actual data) with this structure:
-{{
-    "question": "Question text...",
-    "question_type": "single_select" OR "multiple_selection",
-    "options": {{"A": "...", "B": "...", "C": "...", "D": "..."}},
-    "answer": "A" OR "A, C" (comma separated for multiple),
-    "explanation": "...",
-    "difficulty": "{difficulty}",
-    "distractor_reasoning": [
-        {{"option": "A", "reason": "..."}},
-        {{"option": "B", "reason": "..."}},
-        {{"option": "C", "reason": "..."}},
-        {{"option": "D", "reason": "..."}}
-    ],
-    "topic": "{research_brief.topic}",
-    "cognitive_level": "application"
-}}
-
-Create ONE question that:
-- Tests understanding of the research content
-- Uses a question stem similar to past papers
-- Is appropriate for {difficulty} difficulty
-- matches the requested type: {forced_question_type if forced_question_type else "any valid type"}"""
-
         # Call LLM and parse response
         return await self.call_with_pydantic(
-            system_prompt=system_prompt,
+            system_prompt=_DRAFT_SYSTEM_PROMPT,
             user_prompt=user_prompt,
             model_class=DraftedQuestion,
             temperature=0.7,  # Higher temperature for creative question drafting
             max_tokens=2048
         )
     
+    async def draft_and_self_review(
+        self,
+        research_brief: ResearchBrief,
+        style_profile: Optional[Dict[str, Any]] = None,
+        style_examples: Optional[List[Dict[str, Any]]] = None,
+        difficulty: str = "medium",
+        forced_question_type: Optional[str] = None
+    ) -> SelfReviewedDraft:
+        """
+        Draft a question and check it against the Critic's rubric in one call.
+        
+        Most problems the Critic would reject are fixed before the draft is
+        returned, so the draft -> review -> revise -> review round trips are
+        usually reduced to draft -> review.
+        
+        Args:
+            research_brief: Factual content from Researcher agent
+            style_profile: Extracted style profile from past papers
+            style_examples: Sample questions for style reference
+            difficulty: Target difficulty level
+            forced_question_type: Force a specific question type (single_select or multiple_selection)
+            
+        Returns:
+            SelfReviewedDraft with the corrected question and the fixes made
+        """
+        user_prompt = self._build_draft_prompt(
+            research_brief, style_profile, style_examples, difficulty, forced_question_type
+        )
+        
+        return await self.call_with_pydantic(
+            system_prompt=_SELF_REVIEW_SYSTEM_PROMPT,
+            user_prompt=user_prompt,
+            model_class=SelfReviewedDraft,
+            temperature=0.7,
+            max_tokens=3072  # Room for the review notes alongside the question
+        )
+    
     async def revise_question(
         self,
         current_draft: DraftedQuestion,
@@ -157,30 +201,22 @@ Create ONE question that:
         
         feedback_text = "\n".join([f"- {f}" for f in feedback])
         
-        system_prompt = """You are a Senior Examiner revising a question based on feedback.
-
-Your task:
-1. Address each piece of feedback
-2. Improve the question without changing its core intent
-3. Maintain style consistency with exam papers
-4. Ensure factual accuracy based on research content"""
+        # Serialized by pydantic so quotes and newlines in the draft are escaped
+        draft_json = current_draft.model_dump_json(
+            include=REVISION_DRAFT_FIELDS, indent=4
+        )
+        
+        # Research context (shared with the draft call) leads for prefix caching
+        user_prompt = f"""{research_context}
 
-        user_prompt = f"""Revise this question based on the feedback.
+Revise this question based on the feedback.
 
 CURRENT DRAFT:
-{{
-    "question": "{current_draft.question}",
-    "question_type": "{current_draft.question_type}",
-    "options": {current_draft.options},
-    "answer": "{current_draft.answer}",
-    "explanation": "{current_draft.explanation}"
-}}
+{draft_json}
 
 FEEDBACK TO ADDRESS:
 {feedback_text}
 
-{research_context}
-
 Returns the revised result as a JSON object (NOT schema).
 
 Ensure the revision:
@@ -190,15 +226,100 @@ Ensure the revision:
 - Improves distractor quality"""
 
         return await self.call_with_pydantic(
-            system_prompt=system_prompt,
+            system_prompt=_REVISE_SYSTEM_PROMPT,
             user_prompt=user_prompt,
             model_class=DraftedQuestion,
             temperature=0.6,
             max_tokens=2048
         )
     
+    def _build_draft_prompt(
+        self,
+        research_brief: ResearchBrief,
+        style_profile: Optional[Dict[str, Any]],
+        style_examples: Optional[List[Dict[str, Any]]],
+        difficulty: str,
+        forced_question_type: Optional[str]
+    ) -> str:
+        """Build the user prompt shared by draft_question and draft_and_self_review."""
+        # Format research brief for LLM
+        research_context = self._format_research_brief(research_brief)
+        
+        # Format style profile and examples (the same for a whole run)
+        style_prefix = self._style_prefix(style_profile, style_examples)
+        
+        # Build prompts
+        # Determine type instructions
+        type_instruction = "Determine if the question should be SINGLE_SELECT or MULTIPLE_SELECTION based on content."
+        if forced_question_type == "single_select":
+            type_instruction = "Create a SINGLE_SELECT question (one correct answer)."
+        elif forced_question_type == "multiple_selection":
+            type_instruction = "Create a MULTIPLE_SELECTION question (at least two correct answers). IMPORTANT: Append '(choice 2)' to the end of the question text."
+
+        # Shared context first (style is the same for a whole run, the brief for
+        # every question on a topic) so consecutive requests share the longest
+        # possible cached prefix; per-question instructions go last
+        user_prompt = f"""{style_prefix}
+
+{research_context}
+
+Draft a {difficulty} difficulty question.
+
+QUESTION TYPE: {type_instruction}
+
+TOPIC: {research_brief.topic}
+
+Return the question as JSON matching the DraftedQuestion schema, with "difficulty": "{difficulty}", "topic": "{research_brief.topic}", "answer" like "A" or "A, C", and "distractor_reasoning" as [{{"option": "A", "reason": "..."}}, ...] for every option.
+
+Create ONE question that:
+- Tests understanding of the research content
+- Uses a question stem similar to past papers
+- Is appropriate for {difficulty} difficulty
+- matches the requested type: {forced_question_type if forced_question_type else "any valid type"}"""
+        
+        return user_prompt
+    
+    def _style_prefix(
+        self,
+        style_profile: Optional[Dict[str, Any]],
+        style_examples: Optional[List[Dict[str, Any]]]
+    ) -> str:
+        """
+        Render the style profile and examples block, once per run.
+        
+        A generation run passes the same profile and example objects for
+        every question, so the rendering is memoised by object identity.
+        
+        Args:
+            style_profile: Extracted style profile from past papers
+            style_examples: Sample questions for style reference
+            
+        Returns:
+            Profile and examples prompt text
+        """
+        key = (id(style_profile), id(style_examples))
+        cached = self._style_prefixes.get(key)
+        if cached is not None and cached[0] is style_profile and cached[1] is style_examples:
+            self._style_prefixes.move_to_end(key)
+            return cached[2]
+        
+        profile_context = self._format_style_profile(style_profile) if style_profile else ""
+        style_context = self._format_style_examples(style_examples) if style_examples else ""
+        prefix = f"{profile_context}\n\n{style_context}"
+        
+        self._style_prefixes[key] = (style_profile, style_examples, prefix)
+        self._style_prefixes.move_to_end(key)
+        if len(self._style_prefixes) > self.STYLE_PREFIX_CACHE_SIZE:
+            self._style_prefixes.popitem(last=False)
+        return prefix
+    
     def _format_research_brief(self, brief: ResearchBrief) -> str:
-        """Format ResearchBrief for LLM consumption."""
+        """Format ResearchBrief for LLM consumption (rendered once per brief)."""
+        return brief.rendered("psychometrician", self._render_research_brief)
+    
+    @staticmethod
+    def _render_research_brief(brief: ResearchBrief) -> str:
+        """Render a ResearchBrief as prompt text."""
         sections = []
         
         sections.append("RESEARCH_CONTENT:")
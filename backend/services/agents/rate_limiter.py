@@ -0,0 +1,94 @@
+"""
+Request + token rate limiter for OpenAI calls (GCRA / leaky bucket).
+"""
+import asyncio
+from typing import Optional, Mapping
+
+
+class AsyncGCRALimiter:
+    """
+    Paces calls so they stay under requests-per-minute and tokens-per-minute.
+
+    Uses the Generic Cell Rate Algorithm: each bucket tracks a theoretical
+    arrival time (TAT) that advances by `cost * interval` per call. A call
+    may start once neither bucket is more than one window ahead of now, so
+    a full minute of budget can burst and the rest is spread evenly instead
+    of hitting 429s and backing off.
+
+    Limits left as None are learnt from the x-ratelimit-* response headers.
+    """
+
+    def __init__(
+        self,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        window: float = 60.0
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            rpm: Requests per minute (None = learn from response headers)
+            tpm: Tokens per minute (None = learn from response headers)
+            window: Length of the rate-limit window in seconds
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self._request_tat = 0.0
+        self._token_tat = 0.0
+
+    async def acquire(self, tokens: int, requests: int = 1) -> None:
+        """
+        Reserve capacity for a call, sleeping until it conforms.
+
+        Reservations are made synchronously (no await before the bookkeeping),
+        so concurrent callers queue up in arrival order.
+
+        Args:
+            tokens: Estimated tokens the call will consume (prompt + completion)
+            requests: Number of requests the call counts as
+        """
+        now = asyncio.get_running_loop().time()
+        wait = 0.0
+
+        if self.rpm:
+            self._request_tat = max(self._request_tat, now) + requests * self.window / self.rpm
+            wait = max(wait, self._request_tat - self.window - now)
+
+        if self.tpm:
+            self._token_tat = max(self._token_tat, now) + tokens * self.window / self.tpm
+            wait = max(wait, self._token_tat - self.window - now)
+
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Recalibrate from the server's view of remaining capacity.
+
+        Adopts the advertised limits when none were configured, and moves the
+        TATs forward if the server reports less headroom than we assumed
+        (e.g. other processes sharing the same key).
+
+        Args:
+            headers: Response headers from the OpenAI API
+        """
+        now = asyncio.get_running_loop().time()
+
+        for kind in ("requests", "tokens"):
+            try:
+                limit = int(headers.get(f"x-ratelimit-limit-{kind}"))
+                remaining = int(headers.get(f"x-ratelimit-remaining-{kind}"))
+            except (TypeError, ValueError):
+                continue
+            if limit <= 0:
+                continue
+
+            used_until = now + (limit - remaining) * self.window / limit
+            if kind == "requests":
+                self.rpm = self.rpm or limit
+                self._request_tat = max(self._request_tat, used_until)
+            else:
+                self.tpm = self.tpm or limit
+                self._token_tat = max(self._token_tat, used_until)
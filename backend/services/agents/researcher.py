@@ -1,9 +1,31 @@
 """
 Researcher Agent: Extracts core facts and specific formulas from textbook content.
 """
-from typing import Dict, Any, List, Optional
-from pydantic import BaseModel
+import os
+from typing import Dict, Any, List, Optional, Callable, Union
+from pydantic import BaseModel, PrivateAttr
 from .base_agent import BaseAgent
+from ..semantic_cache import SemanticCache
+
+
+# The structure is enforced by the ResearchBrief response schema
+_RESEARCH_SYSTEM_PROMPT = """You are an expert Researcher for a professional examination board. Your task is to extract and synthesize factual information from textbook content.
+
+Your responsibilities:
+1. Identify the most important core facts for the topic
+2. Extract key definitions with clear wording
+3. List any formulas, rules, or principles
+4. Identify related concepts for context
+5. Cite sources when available
+
+For difficulty levels:
+- EASY: Focus on fundamental concepts, basic definitions, direct facts
+- MEDIUM: Include relationships between concepts, moderate complexity
+- HARD: Include edge cases, exceptions, advanced nuances, interdependencies
+
+CRITICAL: Only use information from the provided TEXTBOOK_CONTENT. Do not hallucinate or add external knowledge.
+
+Return the brief matching the ResearchBrief schema: core facts as {"fact", "importance": "high|medium|low", "source"}, definitions as {"term", "definition"}, formulas/rules as {"name", "expression"}, and a 2-3 sentence "summary"."""
 
 
 class ResearchBrief(BaseModel):
@@ -16,6 +38,26 @@ class ResearchBrief(BaseModel):
     related_concepts: List[str]
     summary: str
     source_references: List[str]
+    
+    # Prompt text rendered from this brief, per agent; one brief is reused for
+    # every question, revision and review on its topic
+    _rendered: Dict[str, str] = PrivateAttr(default_factory=dict)
+    
+    def rendered(self, key: str, render: Callable[["ResearchBrief"], str]) -> str:
+        """
+        Return the brief rendered for a prompt, rendering it only once.
+        
+        Args:
+            key: Identifies the rendering (e.g. the agent name)
+            render: Function producing the prompt text from the brief
+            
+        Returns:
+            Rendered prompt text
+        """
+        text = self._rendered.get(key)
+        if text is None:
+            text = self._rendered[key] = render(self)
+        return text
 
 
 class ResearcherAgent(BaseAgent):
@@ -26,6 +68,13 @@ class ResearcherAgent(BaseAgent):
     This agent ensures factual accuracy by working directly with knowledge base content.
     """
     
+    # Research briefs over up to 15 context chunks
+    request_timeout = 60.0
+    # Concurrent requests for the same topic share one research call
+    coalesce_requests = True
+    # Same topic and context give the same brief
+    cache_responses = True
+    
     def __init__(self, retriever, **kwargs):
         """
         Initialize the Researcher agent.
@@ -36,6 +85,14 @@ class ResearcherAgent(BaseAgent):
         """
         super().__init__(**kwargs)
         self.retriever = retriever
+        
+        # Briefs reused for the same or a paraphrased topic; the threshold is
+        # stricter than retrieval's since the brief text is reused verbatim
+        self.brief_cache = SemanticCache(
+            capacity=int(os.getenv("RESEARCH_CACHE_SIZE", "256")),
+            threshold=float(os.getenv("RESEARCH_CACHE_THRESHOLD", "0.95")),
+            ttl=float(os.getenv("RESEARCH_CACHE_TTL", "3600")) or None
+        )
     
     async def research(
         self,
@@ -56,6 +113,18 @@ class ResearcherAgent(BaseAgent):
         Returns:
             ResearchBrief with extracted knowledge
         """
+        # Step 0: Reuse a brief for the same or a near-identical topic
+        topic_embedding = await self.retriever.embedding_service.generate_embedding(
+            topic, kind="query"
+        )
+        scope = (difficulty, max_facts, max_context_chunks)
+        cached = self.brief_cache.get(topic_embedding, scope)
+        if cached is not None:
+            brief = ResearchBrief.model_validate(cached[0])
+            # The hit may be for a paraphrase; label the brief with this topic
+            brief.topic = topic
+            return brief
+        
         # Step 1: Retrieve relevant content from knowledge base
         context_chunks = await self.retriever.fetch_facts(
             query=topic,
@@ -72,69 +141,49 @@ class ResearcherAgent(BaseAgent):
             max_items=None
         )
         
-        # Step 3: Build prompts
-        system_prompt = """You are an expert Researcher for a professional examination board. Your task is to extract and synthesize factual information from textbook content.
-
-Your responsibilities:
-1. Identify the most important core facts for the topic
-2. Extract key definitions with clear wording
-3. List any formulas, rules, or principles
-4. Identify related concepts for context
-5. Cite sources when available
-
-For difficulty levels:
-- EASY: Focus on fundamental concepts, basic definitions, direct facts
-- MEDIUM: Include relationships between concepts, moderate complexity
-- HARD: Include edge cases, exceptions, advanced nuances, interdependencies
-
-CRITICAL: Only use information from the provided TEXTBOOK_CONTENT. Do not hallucinate or add external knowledge."""
+        # Step 3: Build prompt; the retrieved context leads and the per-request
+        # parameters trail so the cacheable prefix is as long as possible
+        user_prompt = f"""{formatted_context}
 
-        user_prompt = f"""Research the following topic and create a comprehensive research brief.
+Research the following topic and create a comprehensive research brief from the TEXTBOOK_CONTENT above.
 
 TOPIC: {topic}
 DIFFICULTY LEVEL: {difficulty}
 
-{formatted_context}
-
-Return a JSON object with this structure:
-{{
-    "topic": "the topic",
-    "difficulty": "easy|medium|hard",
-    "core_facts": [
-        {{
-            "fact": "The factual statement",
-            "importance": "high|medium|low",
-            "source": "source reference if available"
-        }}
-    ],
-    "key_definitions": [
-        {{
-            "term": "term name",
-            "definition": "clear definition"
-        }}
-    ],
-    "formulas_and_rules": [
-        {{
-            "name": "formula/rule name",
-            "expression": "the formula or rule text"
-        }}
-    ],
-    "related_concepts": ["concept1", "concept2", ...],
-    "summary": "2-3 sentence summary of the topic",
-    "source_references": ["source1", "source2", ...]
-}}
-
 Extract up to {max_facts} core facts, prioritized by relevance and importance."""
 
         # Step 4: Call LLM and parse response
-        response_dict = await self.call_with_json(
-            system_prompt=system_prompt,
+        brief = await self.call_with_pydantic(
+            system_prompt=_RESEARCH_SYSTEM_PROMPT,
             user_prompt=user_prompt,
+            model_class=ResearchBrief,
             temperature=0.3,  # Lower temperature for factual accuracy
             max_tokens=2048
         )
+        self.brief_cache.put(topic_embedding, scope, [brief.model_dump()])
+        return brief
+    
+    async def research_topics(
+        self,
+        topics: List[str],
+        difficulty: str,
+        concurrency: int = 4
+    ) -> List[Union[ResearchBrief, Exception]]:
+        """
+        Research several topics concurrently.
         
-        return ResearchBrief(**response_dict)
+        Args:
+            topics: Topics to research
+            difficulty: Difficulty level (easy, medium, hard)
+            concurrency: Maximum research calls in flight at once
+            
+        Returns:
+            ResearchBrief (or the exception raised) for each topic, in order
+        """
+        return await self.gather_limited(
+            [self.research(topic, difficulty) for topic in topics],
+            concurrency=concurrency
+        )
     
     async def extract_formulas(
         self,
@@ -2,12 +2,86 @@
 Embedding generation service using OpenAI API with text chunking.
 """
 import os
+import re
+import orjson
 import asyncio
-from typing import List, Dict, Any, Optional
+import functools
+import hashlib
+import logging
+import statistics
+import string
+import struct
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, Optional, Tuple
 import asyncpg
-from openai import AsyncOpenAI
 import tiktoken
 
+from .agents.base_agent import RETRYABLE_ERRORS, _get_client, _retry_delay
+
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def encode_vector(embedding: List[float]) -> bytes:
+    """
+    Encode an embedding in pgvector's binary wire format.
+    
+    The format is a big-endian int16 dimension count, an unused int16 and the
+    values as float4, so asyncpg sends 4 bytes per dimension instead of the
+    decimal text of every float.
+    """
+    dim = len(embedding)
+    return struct.pack(f'>HH{dim}f', dim, 0, *embedding)
+
+
+def decode_vector(data: bytes) -> List[float]:
+    """Decode an embedding from pgvector's binary wire format"""
+    dim = struct.unpack_from('>H', data)[0]
+    return list(struct.unpack_from(f'>{dim}f', data, 4))
+
+
+def encode_halfvec(embedding: List[float]) -> bytes:
+    """Encode an embedding as a pgvector halfvec (float2 values, same header)"""
+    dim = len(embedding)
+    return struct.pack(f'>HH{dim}e', dim, 0, *embedding)
+
+
+def decode_halfvec(data: bytes) -> List[float]:
+    """Decode a pgvector halfvec from its binary wire format"""
+    dim = struct.unpack_from('>H', data)[0]
+    return list(struct.unpack_from(f'>{dim}e', data, 4))
+
+
+async def register_vector_codecs(conn: asyncpg.Connection) -> None:
+    """
+    Exchange pgvector `vector` and `halfvec` values with this connection as
+    float lists in binary format.
+    
+    Search queries compare against the halfvec index, so query embeddings
+    are sent as halfvec directly (2 bytes per dimension, no text parsing).
+    
+    Args:
+        conn: Connection to register the binary codecs on
+    """
+    await conn.set_type_codec(
+        'vector',
+        encoder=encode_vector,
+        decoder=decode_vector,
+        schema='public',
+        format='binary'
+    )
+    await conn.set_type_codec(
+        'halfvec',
+        encoder=encode_halfvec,
+        decoder=decode_halfvec,
+        schema='public',
+        format='binary'
+    )
+
 
 class EmbeddingService:
     """Generate and store embeddings for text chunks"""
@@ -18,7 +92,11 @@ class EmbeddingService:
         api_key: Optional[str] = None,
         model: str = "text-embedding-3-small",
         chunk_size: int = 500,
-        chunk_overlap: int = 50
+        chunk_overlap: int = 50,
+        cache_size: Optional[int] = None,
+        embed_batch_size: Optional[int] = None,
+        embed_concurrency: Optional[int] = None,
+        content_hashes: bool = True
     ):
         """
         Initialize the embedding service.
@@ -29,18 +107,45 @@ class EmbeddingService:
             model: Embedding model name
             chunk_size: Maximum tokens per chunk
             chunk_overlap: Overlap tokens between chunks
+            cache_size: Max in-memory cached embeddings (defaults to EMBEDDING_CACHE_SIZE env var)
+            embed_batch_size: Texts per embeddings API request (defaults to EMBED_BATCH_SIZE env var)
+            embed_concurrency: Max concurrent embeddings API requests (defaults to EMBED_CONCURRENCY env var)
+            content_hashes: Whether knowledge_base has the content_sha256 column
+                (migration 010); without it chunks are stored without
+                deduplication
         """
         self.db_pool = db_pool
         self.model = model
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.content_hashes = content_hashes
+        
+        # LRU cache of embeddings keyed by sha256(model + normalized text), backed by
+        # the embedding_cache table so repeated content skips the API
+        self.cache_size = cache_size or int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+        self._cache: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+        
+        self.embed_batch_size = embed_batch_size or int(os.getenv("EMBED_BATCH_SIZE", "100"))
+        self.embed_concurrency = embed_concurrency or int(os.getenv("EMBED_CONCURRENCY", "4"))
+        self.embed_max_retries = int(os.getenv("EMBED_MAX_RETRIES", "4"))
+        
+        # Recent latencies of unhedged single-text (query) requests; once
+        # enough are known, a query still running at the p95 is duplicated
+        # and the first response wins. Ingest batches are never hedged:
+        # their latency scales with batch size, and a duplicate would double
+        # their token spend outside the embed_concurrency limit.
+        self.hedge_requests = os.getenv("EMBED_HEDGE", "false").lower() in ("1", "true", "yes")
+        self._latencies: "deque[float]" = deque(maxlen=200)
         
         # Initialize OpenAI client
         api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OpenAI API key not provided")
         
-        self.client = AsyncOpenAI(api_key=api_key)
+        # Shares the agents' client (and its HTTP/2 connection pool); retries
+        # are handled (with backoff) in _embed_remote
+        self.client = _get_client(api_key)
         
         # Initialize tokenizer for chunking
         try:
@@ -48,73 +153,309 @@ class EmbeddingService:
         except KeyError:
             # Fallback to cl100k_base for newer models
             self.encoding = tiktoken.get_encoding("cl100k_base")
+        self._chunk_text_cached = functools.lru_cache(maxsize=4096)(self._chunk_text_uncached)
     
     def chunk_text(self, text: str) -> List[str]:
         """
         Split text into overlapping chunks based on token count.
         
+        Results are memoised per text, so boilerplate repeated across pages
+        or re-ingested documents is only tokenized once.
+        
         Args:
             text: Input text to chunk
             
         Returns:
             List of text chunks
         """
-        tokens = self.encoding.encode(text)
-        chunks = []
+        return list(self._chunk_text_cached(text))
+    
+    def _chunk_text_uncached(self, text: str) -> Tuple[str, ...]:
+        """Tokenize once, slice the token list into windows and decode each."""
+        # encode_ordinary skips special-token scanning (and doesn't raise on
+        # text that happens to contain "<|endoftext|>")
+        tokens = self.encoding.encode_ordinary(text)
+        if not tokens:
+            return ()
+        
+        # Window starts step by (size - overlap) until a window reaches the end
+        step = self.chunk_size - self.chunk_overlap
+        return tuple(
+            self.encoding.decode(tokens[start:start + self.chunk_size])
+            for start in range(0, max(len(tokens) - self.chunk_overlap, 1), step)
+        )
+    
+    @staticmethod
+    def _normalize_for_cache(text: str) -> str:
+        """
+        Canonicalize text so cosmetic edits map to the same cache key.
+        
+        Re-exported PDFs often differ only in Unicode forms, case, spacing or
+        trailing punctuation; those chunks embed near-identically, so they
+        reuse the cached embedding instead of calling the API again.
+        """
+        text = unicodedata.normalize("NFKC", text).casefold()
+        text = _WHITESPACE_RE.sub(" ", text).strip()
+        return text.rstrip(string.punctuation + " ")
+    
+    def _cache_key(self, text: str) -> bytes:
+        """Build the content-hash cache key for a text under the current model."""
+        normalized = self._normalize_for_cache(text)
+        return hashlib.sha256(f"{self.model}\0{normalized}".encode("utf-8")).digest()
+    
+    def _cache_get(self, key: bytes) -> Optional[List[float]]:
+        """Look up an embedding in the in-memory LRU cache."""
+        embedding = self._cache.get(key)
+        if embedding is not None:
+            self._cache.move_to_end(key)
+        return embedding
+    
+    def _cache_put(self, key: bytes, embedding: List[float]) -> None:
+        """Insert an embedding into the in-memory LRU cache, evicting the oldest."""
+        self._cache[key] = embedding
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    async def _load_persisted_embeddings(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        """
+        Fetch previously stored embeddings from the embedding_cache table.
+        
+        Args:
+            keys: Cache keys to look up
+            
+        Returns:
+            Dict mapping found keys to their embeddings
+        """
+        try:
+            async with self.db_pool.acquire() as conn:
+                rows = await conn.fetch(
+                    """
+                    SELECT hash, embedding
+                    FROM embedding_cache
+                    WHERE hash = ANY($1::bytea[])
+                    """,
+                    keys
+                )
+        except Exception as e:
+            print(f"Embedding cache lookup skipped: {e}")
+            return {}
+        
+        return {bytes(row['hash']): row['embedding'] for row in rows}
+    
+    async def _persist_embeddings(self, entries: Dict[bytes, List[float]], kind: str) -> None:
+        """
+        Write newly generated embeddings through to the embedding_cache table.
+        
+        Args:
+            entries: Dict mapping cache keys to embeddings
+            kind: 'query' for search queries, 'document' for ingested content
+        """
+        try:
+            async with self.db_pool.acquire() as conn:
+                await conn.executemany(
+                    """
+                    INSERT INTO embedding_cache (hash, provider, model, kind, embedding)
+                    VALUES ($1, 'openai', $2, $3, $4::vector)
+                    ON CONFLICT (hash) DO NOTHING
+                    """,
+                    [
+                        (key, self.model, kind, embedding)
+                        for key, embedding in entries.items()
+                    ]
+                )
+        except Exception as e:
+            print(f"Embedding cache write skipped: {e}")
+    
+    async def preload_query_cache(self, limit: Optional[int] = None) -> int:
+        """
+        Load the most recent query embeddings into the in-memory cache.
+        
+        Called at startup so popular topics are served from memory right
+        after a restart instead of costing a database round trip each.
+        
+        Args:
+            limit: Max entries to load (defaults to EMBEDDING_PRELOAD_SIZE env var)
+            
+        Returns:
+            Number of embeddings loaded
+        """
+        limit = limit or int(os.getenv("EMBEDDING_PRELOAD_SIZE", "2048"))
+        limit = min(limit, self.cache_size)
+        
+        async with self.db_pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT hash, embedding
+                FROM embedding_cache
+                WHERE model = $1 AND kind = 'query'
+                ORDER BY created_at DESC
+                LIMIT $2
+                """,
+                self.model,
+                limit
+            )
+        
+        # Insert oldest first so the newest entries end up most recently used
+        for row in reversed(rows):
+            self._cache_put(bytes(row['hash']), row['embedding'])
+        
+        return len(rows)
+    
+    async def _embed_remote(self, texts: List[str]) -> List[List[float]]:
+        """
+        Call the embeddings API for texts that missed every cache tier.
         
-        start = 0
-        while start < len(tokens):
-            end = min(start + self.chunk_size, len(tokens))
-            chunk_tokens = tokens[start:end]
-            chunk_text = self.encoding.decode(chunk_tokens)
-            chunks.append(chunk_text)
+        Args:
+            texts: List of input texts
             
-            # Check if we've reached the end before updating start
-            if end >= len(tokens):
-                break
+        Returns:
+            List of embedding vectors
+        """
+        for attempt in range(self.embed_max_retries + 1):
+            try:
+                response = await self._create_hedged(texts)
+                return [item.embedding for item in response.data]
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.embed_max_retries:
+                    raise RuntimeError(f"Failed to generate batch embeddings: {str(e)}")
+                delay = _retry_delay(e, attempt)
+                logger.warning(
+                    "Embeddings request failed, retry %d/%d in %.1fs: %s",
+                    attempt + 1, self.embed_max_retries, delay, e
+                )
+                await asyncio.sleep(delay)
+            except Exception as e:
+                raise RuntimeError(f"Failed to generate batch embeddings: {str(e)}")
+    
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds after which a request is duplicated (None = never)"""
+        if not self.hedge_requests or len(self._latencies) < 20:
+            return None
+        return statistics.quantiles(self._latencies, n=20)[-1]
+    
+    async def _create_hedged(self, texts: List[str]):
+        """
+        Send one embeddings request, hedging it if it runs unusually long.
+        
+        For a single text, if no response has arrived by the p95 of recent
+        single-text latencies, an identical request is sent and whichever
+        succeeds first is used; the other is cancelled. This trims query
+        tail latency for about 5% extra calls.
+        
+        Args:
+            texts: List of input texts
             
-            # Move to next chunk with overlap
-            start = end - self.chunk_overlap
+        Returns:
+            Embeddings API response
+        """
+        started = time.monotonic()
+        
+        def send() -> asyncio.Task:
+            return asyncio.create_task(
+                self.client.embeddings.create(model=self.model, input=texts)
+            )
         
-        return chunks
+        single = len(texts) == 1
+        hedged = False
+        pending = {send()}
+        try:
+            hedge_after = self._hedge_delay() if single else None
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(pending, timeout=hedge_after)
+                if not done:
+                    pending.add(send())
+                    hedged = True
+            
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        # A hedged call's time includes the hedge wait, so it
+                        # would skew the p95 it was measured against
+                        if single and not hedged:
+                            self._latencies.append(time.monotonic() - started)
+                        return task.result()
+                if not pending:
+                    raise done.pop().exception()
+        finally:
+            for task in pending:
+                task.cancel()
     
-    async def generate_embedding(self, text: str) -> List[float]:
+    async def generate_embedding(self, text: str, kind: str = "document") -> List[float]:
         """
         Generate embedding for a single text.
         
         Args:
             text: Input text
+            kind: 'query' for search queries, 'document' for ingested content
             
         Returns:
             Embedding vector
         """
-        try:
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=text
-            )
-            return response.data[0].embedding
-        except Exception as e:
-            raise RuntimeError(f"Failed to generate embedding: {str(e)}")
+        key = self._cache_key(text)
+        embedding = self._cache_get(key)
+        if embedding is not None:
+            return embedding
+        
+        # Concurrent misses for the same text (e.g. research and style lookups
+        # for one topic) share a single cache lookup and API call
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.generate_embeddings_batch([text], kind=kind))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        
+        # Shielded so one waiter being cancelled doesn't fail the others
+        embeddings = await asyncio.shield(task)
+        return embeddings[0]
     
-    async def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+    async def generate_embeddings_batch(
+        self,
+        texts: List[str],
+        kind: str = "document"
+    ) -> List[List[float]]:
         """
         Generate embeddings for multiple texts in batch.
         
+        Texts are looked up in the in-memory cache, then in the embedding_cache
+        table, and only the remaining misses are sent to the embeddings API.
+        
         Args:
             texts: List of input texts
+            kind: 'query' for search queries, 'document' for ingested content
             
         Returns:
             List of embedding vectors
         """
-        try:
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=texts
-            )
-            return [item.embedding for item in response.data]
-        except Exception as e:
-            raise RuntimeError(f"Failed to generate batch embeddings: {str(e)}")
+        keys = [self._cache_key(text) for text in texts]
+        embeddings: List[Optional[List[float]]] = [self._cache_get(key) for key in keys]
+        
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            persisted = await self._load_persisted_embeddings(list({keys[i] for i in missing}))
+            for i in missing:
+                embedding = persisted.get(keys[i])
+                if embedding is not None:
+                    embeddings[i] = embedding
+                    self._cache_put(keys[i], embedding)
+            missing = [i for i in missing if embeddings[i] is None]
+        
+        if missing:
+            # Identical texts within a batch only need to be embedded once
+            pending: Dict[bytes, str] = {}
+            for i in missing:
+                pending.setdefault(keys[i], texts[i])
+            
+            generated = dict(zip(pending, await self._embed_remote(list(pending.values()))))
+            for key, embedding in generated.items():
+                self._cache_put(key, embedding)
+            for i in missing:
+                embeddings[i] = generated[keys[i]]
+            
+            await self._persist_embeddings(generated, kind)
+        
+        return embeddings
     
     async def store_chunk(
         self,
@@ -135,24 +476,150 @@ class EmbeddingService:
         Returns:
             UUID of the inserted record
         """
-        # Convert embedding list to PostgreSQL vector format
-        import json
-        embedding_str = json.dumps(embedding)
-        metadata_json = json.dumps(metadata or {})
-        
-        async with self.db_pool.acquire() as conn:
-            row = await conn.fetchrow(
+        params = [content, embedding, source_type, metadata or {}]
+        if self.content_hashes:
+            query = """
+                INSERT INTO knowledge_base (content, embedding, source_type, metadata, content_sha256)
+                VALUES ($1, $2::vector, $3, $4::jsonb, $5)
+                RETURNING id
                 """
+            params.append(self._content_hash(content))
+        else:
+            query = """
                 INSERT INTO knowledge_base (content, embedding, source_type, metadata)
                 VALUES ($1, $2::vector, $3, $4::jsonb)
                 RETURNING id
+                """
+        
+        async with self.db_pool.acquire() as conn:
+            row = await conn.fetchrow(query, *params)
+            return str(row['id'])
+    
+    async def store_chunks(
+        self,
+        rows: List[tuple],
+        source_type: str
+    ) -> int:
+        """
+        Store many chunks with a single INSERT ... SELECT FROM unnest().
+        
+        The whole batch travels as four array parameters, so it is one
+        statement and one round trip however many rows there are (executemany
+        still binds and executes once per row).
+        
+        Args:
+            rows: (content, embedding, metadata) tuples
+            source_type: Type of source ('textbook', 'question', 'diagram')
+            
+        Returns:
+            Number of rows stored
+        """
+        if not rows:
+            return 0
+        
+        contents = [content for content, _, _ in rows]
+        embeddings = [embedding for _, embedding, _ in rows]
+        metadatas = [orjson.dumps(metadata or {}).decode() for _, _, metadata in rows]
+        params = [contents, embeddings, metadatas, source_type]
+        if self.content_hashes:
+            query = """
+                INSERT INTO knowledge_base (content, embedding, source_type, metadata, content_sha256)
+                SELECT content, embedding, $4, metadata::jsonb, content_sha256
+                FROM unnest($1::text[], $2::vector[], $3::text[], $5::bytea[])
+                    AS t(content, embedding, metadata, content_sha256)
+                """
+            params.append([self._content_hash(content) for content in contents])
+        else:
+            query = """
+                INSERT INTO knowledge_base (content, embedding, source_type, metadata)
+                SELECT content, embedding, $4, metadata::jsonb
+                FROM unnest($1::text[], $2::vector[], $3::text[])
+                    AS t(content, embedding, metadata)
+                """
+        
+        async with self.db_pool.acquire() as conn:
+            await conn.execute(query, *params)
+        
+        return len(rows)
+    
+    @staticmethod
+    def _content_hash(content: str) -> bytes:
+        """sha256 of a chunk's exact text, as stored in knowledge_base.content_sha256"""
+        return hashlib.sha256(content.encode()).digest()
+    
+    async def _filter_stored(
+        self,
+        texts: List[str],
+        metadata: List[Dict[str, Any]],
+        source_type: str
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Drop sub-chunks already stored for the same file and source type.
+        
+        Repeats within the batch itself are dropped too, so unchanged content
+        is neither embedded nor inserted again. Note this changes what is
+        stored, not only what it costs: text repeated within one upload
+        (e.g. page headers) is kept as a single chunk. Without the
+        content_sha256 column everything is kept.
+        
+        Args:
+            texts: Sub-chunk texts
+            metadata: Metadata for each text
+            source_type: Type of source ('textbook', 'question', 'diagram')
+            
+        Returns:
+            (texts, metadata) of the sub-chunks still to be stored
+        """
+        if not self.content_hashes:
+            return texts, metadata
+        
+        hashes = [self._content_hash(text) for text in texts]
+        
+        async with self.db_pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT content_sha256, metadata->>'filename' AS filename
+                FROM knowledge_base
+                WHERE content_sha256 = ANY($1::bytea[]) AND source_type = $2
                 """,
-                content,
-                embedding_str,
-                source_type,
-                metadata or {}
+                list(set(hashes)),
+                source_type
             )
-            return str(row['id'])
+        seen = {(bytes(row['content_sha256']), row['filename']) for row in rows}
+        
+        kept_texts, kept_metadata = [], []
+        for text, meta, content_hash in zip(texts, metadata, hashes):
+            key = (content_hash, meta.get('filename'))
+            if key in seen:
+                continue
+            seen.add(key)
+            kept_texts.append(text)
+            kept_metadata.append(meta)
+        return kept_texts, kept_metadata
+    
+    async def _process_batch(
+        self,
+        texts: List[str],
+        metadata: List[Dict[str, Any]],
+        source_type: str,
+        semaphore: asyncio.Semaphore
+    ) -> Tuple[int, int]:
+        """
+        Embed one batch of sub-chunks and store it.
+        
+        Args:
+            texts: Sub-chunk texts
+            metadata: Metadata for each text
+            source_type: Type of source ('textbook', 'question', 'diagram')
+            semaphore: Bounds concurrent embeddings API requests
+            
+        Returns:
+            (embeddings generated, rows stored)
+        """
+        async with semaphore:
+            embeddings = await self.generate_embeddings_batch(texts)
+        stored = await self.store_chunks(list(zip(texts, embeddings, metadata)), source_type)
+        return len(embeddings), stored
     
     async def process_and_store(
         self,
@@ -169,39 +636,44 @@ class EmbeddingService:
         Returns:
             Dict with processing statistics
         """
-        stored_count = 0
-        embedding_count = 0
+        # Split every chunk into token-bounded sub-chunks up front; tokenizing
+        # a whole document takes long enough to stall concurrent requests, so
+        # it runs in a worker thread (tiktoken releases the GIL while encoding)
+        all_chunk_texts = []
+        chunk_metadata = []
         
-        # Process in batches of 100 to avoid API limits
-        batch_size = 100
+        split_chunks = await asyncio.to_thread(
+            lambda: [self.chunk_text(chunk['content']) for chunk in chunks]
+        )
         
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i + batch_size]
-            
-            # Extract text content
-            texts = [chunk['content'] for chunk in batch]
-            
-            # Further chunk if needed
-            all_chunk_texts = []
-            chunk_metadata = []
-            
-            for idx, text in enumerate(texts):
-                sub_chunks = self.chunk_text(text)
-                for sub_chunk in sub_chunks:
-                    all_chunk_texts.append(sub_chunk)
-                    # Merge original metadata with chunk info
-                    meta = batch[idx].get('metadata', {})
-                    meta['original_index'] = i + idx
-                    chunk_metadata.append(meta)
-            
-            # Generate embeddings in batch
-            embeddings = await self.generate_embeddings_batch(all_chunk_texts)
-            embedding_count += len(embeddings)
-            
-            # Store all chunks
-            for text, embedding, metadata in zip(all_chunk_texts, embeddings, chunk_metadata):
-                await self.store_chunk(text, embedding, source_type, metadata)
-                stored_count += 1
+        for idx, (chunk, sub_chunks) in enumerate(zip(chunks, split_chunks)):
+            for sub_chunk in sub_chunks:
+                all_chunk_texts.append(sub_chunk)
+                # Merge original metadata with chunk info
+                meta = chunk.get('metadata', {})
+                meta['original_index'] = idx
+                chunk_metadata.append(meta)
+        
+        # Skip sub-chunks this file already has (re-ingest of a revised PDF)
+        all_chunk_texts, chunk_metadata = await self._filter_stored(
+            all_chunk_texts, chunk_metadata, source_type
+        )
+        
+        # Embed batches concurrently, bounded to respect API rate limits, and
+        # store each batch as soon as its embeddings arrive so inserts overlap
+        # with the remaining API calls
+        semaphore = asyncio.Semaphore(self.embed_concurrency)
+        batch_results = await asyncio.gather(*(
+            self._process_batch(
+                all_chunk_texts[i:i + self.embed_batch_size],
+                chunk_metadata[i:i + self.embed_batch_size],
+                source_type,
+                semaphore
+            )
+            for i in range(0, len(all_chunk_texts), self.embed_batch_size)
+        ))
+        embedding_count = sum(embedded for embedded, _ in batch_results)
+        stored_count = sum(stored for _, stored in batch_results)
         
         return {
             'chunks_stored': stored_count,
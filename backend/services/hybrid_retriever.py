@@ -1,9 +1,229 @@
 """
 Hybrid Retriever: Combines vector search and keyword search using Reciprocal Rank Fusion.
 """
-import json
+import os
+import asyncio
+import functools
+from dataclasses import dataclass
 from typing import List, Dict, Any, Optional
 import asyncpg
+from .semantic_cache import SemanticCache
+
+# Candidates fetched per result from the binary-quantized index before the
+# halfvec rerank (0 = search the halfvec index directly)
+BINARY_RERANK_FACTOR = int(os.getenv("VECTOR_BINARY_RERANK", "0"))
+
+# Rank and fuse both searches in one SQL statement instead of two queries
+# merged in Python
+FUSED_SEARCH = os.getenv("HYBRID_FUSED_SQL", "false").lower() in ("1", "true", "yes")
+
+# Ranks covered by HybridRetriever's precomputed RRF score tables
+RRF_TABLE_SIZE = 1024
+
+# Loads the rows that survived the RRF merge ($1 = uuid[] of their ids)
+CONTENT_BY_ID_SQL = """
+                SELECT id, content, metadata, source_type
+                FROM knowledge_base
+                WHERE id = ANY($1::uuid[])
+            """
+
+
+@functools.lru_cache(maxsize=None)
+def vector_search_sql(source_type_count: int) -> str:
+    """
+    Build the pgvector similarity SQL used by HybridRetriever.
+    
+    Returns only ids and scores; content is fetched after the RRF merge for
+    the rows that make the final cut. Parameters are $1 (embedding), $2
+    (similarity threshold), one per source type filter, then the row limit.
+    Kept as a function so the exact query
+    text can also be used to prime asyncpg's statement cache, and memoised
+    so each call site reuses one string per filter count instead of
+    formatting it on every search.
+    
+    Args:
+        source_type_count: Number of source type filter parameters
+        
+    Returns:
+        SQL query text
+    """
+    source_filter = ""
+    if source_type_count:
+        placeholders = ','.join([f'${i + 3}' for i in range(source_type_count)])
+        source_filter = f"AND source_type = ANY(ARRAY[{placeholders}])"
+    
+    return _nearest_sql(source_filter, f"${source_type_count + 3}")
+
+
+def _nearest_sql(source_filter: str, limit_param: str) -> str:
+    """
+    Build the nearest-neighbour query shared by the separate and fused searches.
+    
+    Selects id and similarity for the closest rows above the threshold, via
+    the binary-quantized prefilter when BINARY_RERANK_FACTOR is set.
+    
+    Args:
+        source_filter: Source type condition (or empty string)
+        limit_param: Placeholder of the row limit parameter
+        
+    Returns:
+        SQL query text
+    """
+    if BINARY_RERANK_FACTOR > 0:
+        return _binary_rerank_sql(source_filter, limit_param)
+    
+    return f"""
+                SELECT 
+                    id,
+                    1 - (embedding::halfvec(1536) <=> $1::halfvec(1536)) as similarity
+                FROM knowledge_base
+                WHERE 1 - (embedding::halfvec(1536) <=> $1::halfvec(1536)) > $2
+                    {source_filter}
+                ORDER BY embedding::halfvec(1536) <=> $1::halfvec(1536)
+                LIMIT {limit_param}
+            """
+
+
+def _binary_rerank_sql(source_filter: str, limit_param: str) -> str:
+    """
+    Build the two-stage variant of the vector similarity SQL.
+    
+    The bit index over binary_quantize(embedding) returns
+    BINARY_RERANK_FACTOR candidates per requested row by Hamming distance;
+    only those are rescored by halfvec cosine distance. Parameters and
+    columns match vector_search_sql.
+    
+    Args:
+        source_filter: Source type condition (or empty string)
+        limit_param: Placeholder of the row limit parameter
+        
+    Returns:
+        SQL query text
+    """
+    return f"""
+                WITH candidates AS (
+                    SELECT id, embedding
+                    FROM knowledge_base
+                    WHERE TRUE
+                        {source_filter}
+                    ORDER BY binary_quantize(embedding)::bit(1536)
+                        <~> binary_quantize($1::halfvec(1536))::bit(1536)
+                    LIMIT {limit_param} * {BINARY_RERANK_FACTOR}
+                ),
+                ranked AS (
+                    SELECT id, 1 - (embedding::halfvec(1536) <=> $1::halfvec(1536)) as similarity
+                    FROM candidates
+                )
+                SELECT id, similarity
+                FROM ranked
+                WHERE similarity > $2
+                ORDER BY similarity DESC
+                LIMIT {limit_param}
+            """
+
+
+@functools.lru_cache(maxsize=None)
+def keyword_search_sql(source_type_count: int) -> str:
+    """
+    Build the full-text keyword SQL used by HybridRetriever.
+    
+    Returns only ids and ranks, like vector_search_sql. Parameters are $1
+    (query text), one per source type filter, then the row limit.
+    
+    Args:
+        source_type_count: Number of source type filter parameters
+        
+    Returns:
+        SQL query text
+    """
+    source_filter = ""
+    if source_type_count:
+        placeholders = ','.join([f'${i + 2}' for i in range(source_type_count)])
+        source_filter = f"AND source_type = ANY(ARRAY[{placeholders}])"
+    
+    return f"""
+                SELECT 
+                    id,
+                    ts_rank(tsv, plainto_tsquery('english', $1)) as rank
+                FROM knowledge_base
+                WHERE tsv @@ plainto_tsquery('english', $1)
+                    {source_filter}
+                ORDER BY rank DESC
+                LIMIT ${source_type_count + 2}
+            """
+
+
+@functools.lru_cache(maxsize=None)
+def fused_search_sql(source_type_count: int) -> str:
+    """
+    Build the single-statement hybrid search SQL (both rankings plus RRF).
+    
+    Parameters are $1 (embedding), $2 (similarity threshold), $3 (query
+    text), one per source type filter, then the per-method row limit, the
+    final row limit, the vector weight, the keyword weight and the RRF k.
+    Rows match what _rrf_merge produces from the two separate searches, in
+    the same order; the vector ranking honours VECTOR_BINARY_RERANK too.
+    
+    Args:
+        source_type_count: Number of source type filter parameters
+        
+    Returns:
+        SQL query text
+    """
+    source_filter = ""
+    if source_type_count:
+        placeholders = ','.join([f'${i + 4}' for i in range(source_type_count)])
+        source_filter = f"AND source_type = ANY(ARRAY[{placeholders}])"
+    
+    p = source_type_count + 4
+    per_method_limit, limit = f"${p}", f"${p + 1}"
+    vector_weight, keyword_weight, k = f"${p + 2}", f"${p + 3}", f"${p + 4}"
+    
+    return f"""
+                WITH v AS (
+                    SELECT id, similarity,
+                        row_number() OVER (ORDER BY similarity DESC) AS vector_rank
+                    FROM ({_nearest_sql(source_filter, per_method_limit)}) nearest
+                ),
+                k AS (
+                    SELECT id, rank,
+                        row_number() OVER (ORDER BY rank DESC) AS keyword_rank
+                    FROM (
+                        SELECT id, ts_rank(tsv, plainto_tsquery('english', $3)) AS rank
+                        FROM knowledge_base
+                        WHERE tsv @@ plainto_tsquery('english', $3)
+                            {source_filter}
+                        ORDER BY rank DESC
+                        LIMIT {per_method_limit}
+                    ) matches
+                )
+                SELECT 
+                    kb.id,
+                    kb.content,
+                    kb.metadata,
+                    kb.source_type,
+                    COALESCE(v.similarity, k.rank) AS similarity,
+                    v.vector_rank,
+                    k.keyword_rank,
+                    COALESCE({vector_weight}::float8 / ({k}::float8 + v.vector_rank), 0)
+                        + COALESCE({keyword_weight}::float8 / ({k}::float8 + k.keyword_rank), 0)
+                        AS combined_score
+                FROM v
+                FULL OUTER JOIN k ON k.id = v.id
+                JOIN knowledge_base kb ON kb.id = COALESCE(v.id, k.id)
+                ORDER BY combined_score DESC, v.vector_rank NULLS LAST, k.keyword_rank
+                LIMIT {limit}
+            """
+
+
+@dataclass(slots=True)
+class SearchHit:
+    """A ranked search result before its content is loaded."""
+    id: str
+    similarity: float
+    vector_rank: Optional[int] = None
+    keyword_rank: Optional[int] = None
+    combined_score: float = 0.0
 
 
 class HybridRetriever:
@@ -39,6 +259,17 @@ class HybridRetriever:
         self.vector_weight = vector_weight
         self.keyword_weight = keyword_weight
         self.k = k
+        
+        # Weighted RRF contribution of each rank, so merging is a lookup per
+        # hit; deeper ranks (beyond any search limit used here) are computed
+        self._vector_rrf = [vector_weight / (k + rank) for rank in range(1, RRF_TABLE_SIZE + 1)]
+        self._keyword_rrf = [keyword_weight / (k + rank) for rank in range(1, RRF_TABLE_SIZE + 1)]
+        
+        # Results for paraphrased queries are reused without hitting the DB
+        self.semantic_cache = SemanticCache(
+            capacity=int(os.getenv("SEMANTIC_CACHE_SIZE", "100")),
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+        )
     
     async def search(
         self,
@@ -59,21 +290,40 @@ class HybridRetriever:
         Returns:
             List of merged results with combined scores
         """
-        # Run both searches in parallel
-        vector_results = await self._vector_search(
-            query, source_types, similarity_threshold, limit * 2
-        )
-        keyword_results = await self._keyword_search(
-            query, source_types, limit * 2
+        query_embedding = await self.embedding_service.generate_embedding(query, kind="query")
+        
+        scope = (tuple(source_types or ()), limit, similarity_threshold)
+        cached = self.semantic_cache.get(query_embedding, scope)
+        if cached is not None:
+            return cached
+        
+        if FUSED_SEARCH:
+            results = await self._fused_search(
+                query, query_embedding, source_types, similarity_threshold, limit
+            )
+            self.semantic_cache.put(query_embedding, scope, results)
+            return results
+        
+        # Run both searches in parallel on separate pool connections
+        vector_results, keyword_results = await asyncio.gather(
+            self._vector_search(
+                query_embedding, source_types, similarity_threshold, limit * 2
+            ),
+            self._keyword_search(
+                query, source_types, limit * 2
+            )
         )
         
         # Merge using Reciprocal Rank Fusion
         merged = self._rrf_merge(vector_results, keyword_results)
         
         # Sort by combined score and limit
-        merged.sort(key=lambda x: x['combined_score'], reverse=True)
+        merged.sort(key=lambda hit: hit.combined_score, reverse=True)
         
-        return merged[:limit]
+        # Only the rows that made the cut have their content transferred
+        results = await self._load_content(merged[:limit])
+        self.semantic_cache.put(query_embedding, scope, results)
+        return results
     
     async def fetch_facts(
         self,
@@ -135,67 +385,80 @@ class HybridRetriever:
     
     async def _vector_search(
         self,
-        query: str,
+        query_embedding: List[float],
         source_types: Optional[List[str]],
         similarity_threshold: float,
         limit: int
-    ) -> List[Dict[str, Any]]:
+    ) -> List[SearchHit]:
         """
         Perform vector similarity search using pgvector.
         
         Args:
-            query: Search query
+            query_embedding: Embedding of the search query
             source_types: List of source types to filter
             similarity_threshold: Minimum similarity score
             limit: Maximum results
             
         Returns:
-            List of results with vector similarity scores
+            Hits with vector similarity scores
         """
-        # Generate embedding for query
-        query_embedding = await self.embedding_service.generate_embedding(query)
-        embedding_str = json.dumps(query_embedding)
+        params = [query_embedding, similarity_threshold, *(source_types or []), limit]
+        query_sql = vector_search_sql(len(source_types or []))
         
-        # Build source type filter
-        source_filter = ""
-        params = [embedding_str, similarity_threshold]
+        async with self.db_pool.acquire() as conn:
+            rows = await conn.fetch(query_sql, *params)
+            
+            return [
+                SearchHit(str(row['id']), float(row['similarity']), vector_rank=i + 1)
+                for i, row in enumerate(rows)
+            ]
+    
+    async def _fused_search(
+        self,
+        query: str,
+        query_embedding: List[float],
+        source_types: Optional[List[str]],
+        similarity_threshold: float,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Run both searches and the RRF merge in one round trip.
         
-        if source_types:
-            placeholders = ','.join([f'${i + 3}' for i in range(len(source_types))])
-            source_filter = f"AND source_type = ANY(ARRAY[{placeholders}])"
-            params.extend(source_types)
+        Each row's content and metadata is transferred once even when it is
+        found by both methods.
         
-        params.append(limit)
+        Args:
+            query: Search query
+            query_embedding: Embedding of the search query
+            source_types: List of source types to filter
+            similarity_threshold: Minimum similarity score
+            limit: Maximum merged results
+            
+        Returns:
+            Merged results with combined scores, best first
+        """
+        params = [
+            query_embedding, similarity_threshold, query,
+            *(source_types or []),
+            limit * 2, limit, self.vector_weight, self.keyword_weight, self.k
+        ]
+        query_sql = fused_search_sql(len(source_types or []))
         
         async with self.db_pool.acquire() as conn:
-            query_sql = f"""
-                SELECT 
-                    id,
-                    content,
-                    metadata,
-                    source_type,
-                    1 - (embedding <=> $1::vector) as similarity
-                FROM knowledge_base
-                WHERE 1 - (embedding <=> $1::vector) > $2
-                    {source_filter}
-                ORDER BY embedding <=> $1::vector
-                LIMIT ${len(params)}
-            """
-            
             rows = await conn.fetch(query_sql, *params)
             
             return [
                 {
                     'id': str(row['id']),
                     'content': row['content'],
-                    'metadata': dict(row['metadata']),
+                    'metadata': row['metadata'] or {},
                     'source_type': row['source_type'],
                     'similarity': float(row['similarity']),
-                    'vector_rank': i + 1,
-                    'keyword_rank': None,
-                    'combined_score': 0.0
+                    'vector_rank': row['vector_rank'],
+                    'keyword_rank': row['keyword_rank'],
+                    'combined_score': row['combined_score']
                 }
-                for i, row in enumerate(rows)
+                for row in rows
             ]
     
     async def _keyword_search(
@@ -203,7 +466,7 @@ class HybridRetriever:
         query: str,
         source_types: Optional[List[str]],
         limit: int
-    ) -> List[Dict[str, Any]]:
+    ) -> List[SearchHit]:
         """
         Perform full-text keyword search using PostgreSQL tsvector.
         
@@ -213,57 +476,67 @@ class HybridRetriever:
             limit: Maximum results
             
         Returns:
-            List of results with keyword ranking scores
+            Hits with keyword ranking scores
         """
-        # Convert query to tsquery
         # Simple approach: use plainto_tsquery for natural language queries
-        params = [query]
-        
-        # Build source type filter
-        source_filter = ""
-        if source_types:
-            placeholders = ','.join([f'${i + 2}' for i in range(len(source_types))])
-            source_filter = f"AND source_type = ANY(ARRAY[{placeholders}])"
-            params.extend(source_types)
-        
-        params.append(limit)
+        params = [query, *(source_types or []), limit]
+        query_sql = keyword_search_sql(len(source_types or []))
         
         async with self.db_pool.acquire() as conn:
-            query_sql = f"""
-                SELECT 
-                    id,
-                    content,
-                    metadata,
-                    source_type,
-                    ts_rank(tsv, plainto_tsquery('english', $1)) as rank
-                FROM knowledge_base
-                WHERE tsv @@ plainto_tsquery('english', $1)
-                    {source_filter}
-                ORDER BY rank DESC
-                LIMIT ${len(params)}
-            """
-            
             rows = await conn.fetch(query_sql, *params)
             
             return [
-                {
-                    'id': str(row['id']),
-                    'content': row['content'],
-                    'metadata': dict(row['metadata']),
-                    'source_type': row['source_type'],
-                    'similarity': float(row['rank']),  # Use keyword rank as similarity
-                    'vector_rank': None,
-                    'keyword_rank': i + 1,
-                    'combined_score': 0.0
-                }
+                # Use keyword rank as similarity
+                SearchHit(str(row['id']), float(row['rank']), keyword_rank=i + 1)
                 for i, row in enumerate(rows)
             ]
     
+    async def _load_content(self, hits: List[SearchHit]) -> List[Dict[str, Any]]:
+        """
+        Attach content, metadata and source type to merged search hits.
+        
+        Args:
+            hits: Merged results (ids, ranks and scores), best first
+            
+        Returns:
+            Full results in the same order; hits whose row has been deleted
+            since the search are dropped
+        """
+        if not hits:
+            return []
+        
+        async with self.db_pool.acquire() as conn:
+            rows = await conn.fetch(CONTENT_BY_ID_SQL, [hit.id for hit in hits])
+        by_id = {str(row['id']): row for row in rows}
+        
+        results = []
+        for hit in hits:
+            row = by_id.get(hit.id)
+            if row is None:
+                continue
+            results.append({
+                'id': hit.id,
+                'content': row['content'],
+                'metadata': row['metadata'] or {},
+                'source_type': row['source_type'],
+                'similarity': hit.similarity,
+                'vector_rank': hit.vector_rank,
+                'keyword_rank': hit.keyword_rank,
+                'combined_score': hit.combined_score
+            })
+        return results
+    
+    def _rrf_table(self, table: List[float], weight: float, depth: int) -> List[float]:
+        """Return weighted RRF scores for ranks 1..depth from a precomputed table."""
+        if depth <= len(table):
+            return table
+        return table + [weight / (self.k + rank) for rank in range(len(table) + 1, depth + 1)]
+    
     def _rrf_merge(
         self,
-        vector_results: List[Dict[str, Any]],
-        keyword_results: List[Dict[str, Any]]
-    ) -> List[Dict[str, Any]]:
+        vector_results: List[SearchHit],
+        keyword_results: List[SearchHit]
+    ) -> List[SearchHit]:
         """
         Merge results using Reciprocal Rank Fusion (RRF).
         
@@ -281,35 +554,28 @@ class HybridRetriever:
         Returns:
             Merged results with combined scores
         """
-        # Create ID-indexed maps
+        # The hits are built fresh by each search, so they are updated in
+        # place rather than copied; scores are looked up by
+        # position since ranks are 1..n in list order
+        vector_rrf = self._rrf_table(self._vector_rrf, self.vector_weight, len(vector_results))
+        keyword_rrf = self._rrf_table(self._keyword_rrf, self.keyword_weight, len(keyword_results))
         merged = {}
         
         # Process vector results
-        for result in vector_results:
-            result_id = result['id']
-            vector_rank = result['vector_rank']
-            
-            if result_id not in merged:
-                merged[result_id] = result.copy()
-            
-            # Calculate RRF score for vector search
-            rrf_score = self.vector_weight * (1 / (self.k + vector_rank))
-            merged[result_id]['combined_score'] += rrf_score
+        for i, hit in enumerate(vector_results):
+            hit.combined_score = vector_rrf[i]
+            merged[hit.id] = hit
         
         # Process keyword results
-        for result in keyword_results:
-            result_id = result['id']
-            keyword_rank = result['keyword_rank']
-            
-            if result_id not in merged:
-                merged[result_id] = result.copy()
+        for i, hit in enumerate(keyword_results):
+            rrf_score = keyword_rrf[i]
+            existing = merged.get(hit.id)
+            if existing is None:
+                hit.combined_score = rrf_score
+                merged[hit.id] = hit
             else:
-                # Add keyword rank if not already present
-                merged[result_id]['keyword_rank'] = keyword_rank
-            
-            # Calculate RRF score for keyword search
-            rrf_score = self.keyword_weight * (1 / (self.k + keyword_rank))
-            merged[result_id]['combined_score'] += rrf_score
+                existing.keyword_rank = hit.keyword_rank
+                existing.combined_score += rrf_score
         
         # Convert back to list
         return list(merged.values())
@@ -0,0 +1,120 @@
+"""
+In-process job queue for background PDF ingestion.
+"""
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class IngestJobQueue:
+    """
+    Bounded queue of ingestion jobs processed by a fixed pool of worker tasks.
+    
+    Lets the upload endpoint return as soon as the file is saved. The bounded
+    backlog gives backpressure under bursts: submit() fails fast instead of
+    letting pending work grow without limit. Job state is kept in memory and
+    expires `result_ttl` seconds after a job finishes.
+    """
+    
+    def __init__(
+        self,
+        handler: Callable[..., Awaitable[Any]],
+        workers: int = 2,
+        max_pending: int = 32,
+        result_ttl: float = 3600
+    ):
+        """
+        Initialize the job queue.
+        
+        Args:
+            handler: Async function called with each job's keyword payload
+            workers: Number of jobs processed concurrently
+            max_pending: Maximum queued jobs before submit() rejects
+            result_ttl: Seconds to keep finished job state
+        """
+        self.handler = handler
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: List[asyncio.Task] = []
+    
+    def start(self) -> None:
+        """Start the worker tasks (call from within the running event loop)."""
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+    
+    async def stop(self) -> None:
+        """Cancel the worker tasks and wait for them to exit."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    def submit(self, **payload: Any) -> str:
+        """
+        Enqueue a job.
+        
+        Args:
+            **payload: Keyword arguments passed to the handler
+            
+        Returns:
+            Job ID
+            
+        Raises:
+            asyncio.QueueFull: If the backlog is full
+        """
+        self._prune()
+        job_id = uuid.uuid4().hex
+        self._queue.put_nowait((job_id, payload))
+        self._jobs[job_id] = {
+            'job_id': job_id,
+            'status': 'queued',
+            'result': None,
+            'error': None,
+            'finished_at': None
+        }
+        return job_id
+    
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the current state of a job.
+        
+        Args:
+            job_id: Job ID returned by submit()
+            
+        Returns:
+            Job state dict, or None if unknown or expired
+        """
+        self._prune()
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        return {key: value for key, value in job.items() if key != 'finished_at'}
+    
+    def _prune(self) -> None:
+        """Drop finished jobs older than the result TTL."""
+        cutoff = time.monotonic() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] is not None and job['finished_at'] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+    
+    async def _worker(self) -> None:
+        """Process jobs from the queue until cancelled."""
+        while True:
+            job_id, payload = await self._queue.get()
+            job = self._jobs[job_id]
+            job['status'] = 'running'
+            try:
+                job['result'] = await self.handler(**payload)
+                job['status'] = 'completed'
+            except Exception as e:
+                print(f"Ingestion job {job_id} failed: {e}")
+                job['error'] = str(e)
+                job['status'] = 'failed'
+            finally:
+                job['finished_at'] = time.monotonic()
+                self._queue.task_done()
@@ -1,7 +1,7 @@
 """
 PDF export service for generating formatted question sheets.
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, IO, Optional
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
@@ -69,13 +69,23 @@ class PDFExporter:
             spaceBefore=6,
             spaceAfter=12
         ))
+        
+        # Resolved once; generate_pdf would otherwise look each style up by
+        # name for every question and option
+        self._title_style = self.styles['CustomTitle']
+        self._normal_style = self.styles['Normal']
+        self._question_style = self.styles['Question']
+        self._option_style = self.styles['Option']
+        self._answer_style = self.styles['Answer']
+        self._explanation_style = self.styles['Explanation']
     
     def generate_pdf(
         self,
         questions: List[Dict[str, Any]],
         topic: str,
-        difficulty: str
-    ) -> BytesIO:
+        difficulty: str,
+        out: Optional[IO[bytes]] = None
+    ) -> IO[bytes]:
         """
         Generate a PDF from questions.
         
@@ -83,11 +93,12 @@ class PDFExporter:
             questions: List of question dictionaries
             topic: Exam topic
             difficulty: Question difficulty level
+            out: Binary file object to write to (defaults to a new BytesIO)
             
         Returns:
-            BytesIO buffer containing the PDF
+            The file object containing the PDF, rewound to the start
         """
-        buffer = BytesIO()
+        buffer = out if out is not None else BytesIO()
         doc = SimpleDocTemplate(
             buffer,
             pagesize=letter,
@@ -101,14 +112,14 @@ class PDFExporter:
         story = []
         
         # Title
-        story.append(Paragraph(f"{topic.upper()}", self.styles['CustomTitle']))
+        story.append(Paragraph(f"{topic.upper()}", self._title_style))
         story.append(Paragraph(
             f"Exam Questions - {difficulty.capitalize()} Level",
-            self.styles['Normal']
+            self._normal_style
         ))
         story.append(Paragraph(
             f"Generated: {datetime.now().strftime('%B %d, %Y')}",
-            self.styles['Normal']
+            self._normal_style
         ))
         story.append(Spacer(1, 0.3*inch))
         
@@ -117,7 +128,7 @@ class PDFExporter:
             # Question number and text
             story.append(Paragraph(
                 f"<b>Question {idx}:</b> {q['question']}",
-                self.styles['Question']
+                self._question_style
             ))
             
             # Options
@@ -128,7 +139,7 @@ class PDFExporter:
                     option_text = f"<b>{key}.</b> {value}"
                     if is_correct:
                         option_text += " <b>✓</b>"
-                    story.append(Paragraph(option_text, self.styles['Option']))
+                    story.append(Paragraph(option_text, self._option_style))
             elif isinstance(q['options'], list):
                 # Exam format: List[Dict[str, Any]] (id, content)
                 for opt in q['options']:
@@ -140,25 +151,25 @@ class PDFExporter:
                     option_text = f"<b>{opt['id']}.</b> {opt['content']}"
                     if is_correct:
                         option_text += " <b>✓</b>"
-                    story.append(Paragraph(option_text, self.styles['Option']))
+                    story.append(Paragraph(option_text, self._option_style))
             
             # Answer
             if 'correct_answers' in q and isinstance(q['correct_answers'], list):
                  answer_text = ", ".join(str(aid) for aid in q['correct_answers'])
                  story.append(Paragraph(
                     f"<b>Correct Answer(s):</b> {answer_text}",
-                    self.styles['Answer']
+                    self._answer_style
                 ))
             else:
                 story.append(Paragraph(
                     f"<b>Correct Answer:</b> {q.get('answer', 'N/A')}",
-                    self.styles['Answer']
+                    self._answer_style
                 ))
             
             # Explanation
             story.append(Paragraph(
                 f"<b>Explanation:</b> {q['explanation']}",
-                self.styles['Explanation']
+                self._explanation_style
             ))
             
             # Add page break every 3 questions (except last)
@@ -1,19 +1,36 @@
 """
 PDF parsing service using PyMuPDF (fitz) for reliable cross-platform extraction.
 """
+import os
 import asyncio
+from concurrent.futures import Executor
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import base64
-import io
 import fitz  # PyMuPDF
 
+# Images larger than this are skipped rather than base64-encoded; the vision
+# API rejects images over 20 MB anyway
+MAX_IMAGE_BYTES = int(os.getenv("PDF_MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+
 
 class PDFParser:
     """Parse PDF documents and extract text and images"""
     
-    def __init__(self):
-        pass
+    def __init__(self, executor: Optional[Executor] = None, pages_per_task: Optional[int] = None):
+        """
+        Initialize the parser.
+        
+        Args:
+            executor: Executor to run extraction in; a ProcessPoolExecutor
+                lets parsing use other cores instead of contending for the
+                GIL (defaults to a worker thread)
+            pages_per_task: Pages extracted per executor task, so one large
+                PDF is spread over several workers (defaults to
+                PDF_PAGES_PER_TASK env var)
+        """
+        self.executor = executor
+        self.pages_per_task = pages_per_task or int(os.getenv("PDF_PAGES_PER_TASK", "16"))
     
     async def parse_pdf(self, file_path: str) -> Dict[str, Any]:
         """
@@ -28,81 +45,162 @@ class PDFParser:
                 - images: List of base64-encoded images
                 - metadata: Document-level metadata
         """
-        # Run PDF conversion in thread pool (it's CPU-bound)
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
-            self._convert_pdf,
-            file_path
-        )
-        return result
+        # PDF conversion is CPU-bound; keep it off the event loop
+        if self.executor is None:
+            return await asyncio.to_thread(convert_pdf, file_path)
+        
+        # Pages are independent, so page ranges are extracted in parallel
+        # across the pool's processes and stitched back together in order
+        page_count = await asyncio.to_thread(count_pages, file_path)
+        loop = asyncio.get_running_loop()
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(
+                self.executor,
+                convert_pages,
+                file_path,
+                start,
+                min(start + self.pages_per_task, page_count)
+            )
+            for start in range(0, page_count, self.pages_per_task)
+        ))
+        return merge_pages(file_path, page_count, parts)
+
+
+def count_pages(file_path: str) -> int:
+    """Return the number of pages in a PDF (only reads the page tree)."""
+    try:
+        with fitz.open(file_path, filetype="pdf") as doc:
+            return len(doc)
+    except Exception as e:
+        raise RuntimeError(f"Failed to parse PDF: {str(e)}")
+
+
+def convert_pages(file_path: str, start: int, end: int) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Extract text blocks and images from pages [start, end) of a PDF.
     
-    def _convert_pdf(self, file_path: str) -> Dict[str, Any]:
-        """Synchronous PDF conversion (runs in thread pool)"""
-        try:
-            doc = fitz.open(file_path)
-            chunks = []
-            images = []
+    Module-level so it can be pickled into a ProcessPoolExecutor; the
+    result contains only plain dicts, lists and strings. Each image carries
+    its xref so merge_pages can drop images repeated across page ranges.
+    """
+    try:
+        doc = fitz.open(file_path)
+        chunks = []
+        images = []
+        # Logos and backgrounds are usually one image object referenced from
+        # every page; extract (and describe) each only once
+        seen_xrefs = set()
+        
+        # Extract text and images from each page
+        for page_num in range(start, end):
+            page = doc[page_num]
             
-            # Extract text and images from each page
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                
-                # Extract text with blocks
-                text_blocks = page.get_text("blocks")
-                for block_idx, block in enumerate(text_blocks):
-                    # block format: (x0, y0, x1, y1, "text", block_no, block_type)
-                    if len(block) >= 5:
-                        text_content = block[4].strip()
-                        if text_content:
-                            chunks.append({
-                                'content': text_content,
-                                'page': page_num + 1,
-                                'type': 'text_block',
-                                'metadata': {
-                                    'source_page': page_num + 1,
-                                    'block_index': block_idx,
-                                    'bbox': [block[0], block[1], block[2], block[3]]
-                                }
-                            })
-                
-                # Extract images
-                image_list = page.get_images(full=True)
-                for img_idx, img_info in enumerate(image_list):
-                    try:
-                        xref = img_info[0]
-                        base_image = doc.extract_image(xref)
-                        image_bytes = base_image["image"]
-                        image_ext = base_image["ext"]
-                        
-                        # Convert to base64
-                        img_data = base64.b64encode(image_bytes).decode('utf-8')
-                        images.append({
-                            'data': img_data,
+            # Extract text with blocks
+            text_blocks = page.get_text("blocks")
+            for block_idx, block in enumerate(text_blocks):
+                # block format: (x0, y0, x1, y1, "text", block_no, block_type)
+                if len(block) >= 5:
+                    text_content = block[4].strip()
+                    if text_content:
+                        chunks.append({
+                            'content': text_content,
                             'page': page_num + 1,
-                            'format': image_ext
+                            'type': 'text_block',
+                            'metadata': {
+                                'source_page': page_num + 1,
+                                'block_index': block_idx,
+                                'bbox': [block[0], block[1], block[2], block[3]]
+                            }
                         })
-                    except Exception as e:
-                        print(f"Warning: Failed to extract image {img_idx} on page {page_num + 1}: {e}")
-            
-            # Document metadata
-            metadata = {
-                'filename': Path(file_path).name,
-                'total_pages': len(doc),
-                'total_chunks': len(chunks),
-                'total_images': len(images)
-            }
-            
-            doc.close()
             
-            return {
-                'chunks': chunks,
-                'images': images,
-                'metadata': metadata
-            }
-            
-        except Exception as e:
-            raise RuntimeError(f"Failed to parse PDF: {str(e)}")
+            # Extract images
+            image_list = page.get_images(full=True)
+            for img_idx, img_info in enumerate(image_list):
+                xref = img_info[0]
+                if xref in seen_xrefs:
+                    continue
+                seen_xrefs.add(xref)
+                
+                try:
+                    base_image = doc.extract_image(xref)
+                    image_bytes = base_image["image"]
+                    image_ext = base_image["ext"]
+                    
+                    if len(image_bytes) > MAX_IMAGE_BYTES:
+                        print(f"Warning: Skipped image {img_idx} on page {page_num + 1} ({len(image_bytes)} bytes)")
+                        continue
+                    
+                    # Convert to base64
+                    img_data = base64.b64encode(image_bytes).decode('ascii')
+                    images.append({
+                        'data': img_data,
+                        'page': page_num + 1,
+                        'format': image_ext,
+                        'xref': xref
+                    })
+                except Exception as e:
+                    print(f"Warning: Failed to extract image {img_idx} on page {page_num + 1}: {e}")
+        
+        doc.close()
+        
+        return {
+            'chunks': chunks,
+            'images': images
+        }
+        
+    except Exception as e:
+        raise RuntimeError(f"Failed to parse PDF: {str(e)}")
+
+
+def merge_pages(
+    file_path: str,
+    page_count: int,
+    parts: List[Dict[str, List[Dict[str, Any]]]]
+) -> Dict[str, Any]:
+    """
+    Combine convert_pages results (in page order) into one parse result.
+    
+    Args:
+        file_path: Path to the PDF file
+        page_count: Total pages in the document
+        parts: Results of convert_pages for consecutive page ranges
+        
+    Returns:
+        Dict with chunks, images and document-level metadata
+    """
+    chunks = []
+    images = []
+    seen_xrefs = set()
+    for part in parts:
+        chunks.extend(part['chunks'])
+        for image in part['images']:
+            if image['xref'] not in seen_xrefs:
+                seen_xrefs.add(image['xref'])
+                images.append(image)
+    
+    # Document metadata
+    metadata = {
+        'filename': Path(file_path).name,
+        'total_pages': page_count,
+        'total_chunks': len(chunks),
+        'total_images': len(images)
+    }
+    
+    return {
+        'chunks': chunks,
+        'images': images,
+        'metadata': metadata
+    }
+
+
+def convert_pdf(file_path: str) -> Dict[str, Any]:
+    """
+    Synchronous PDF conversion of the whole document in one call.
+    
+    Used when no executor is configured (runs in a worker thread).
+    """
+    page_count = count_pages(file_path)
+    return merge_pages(file_path, page_count, [convert_pages(file_path, 0, page_count)])
 
 
 # CLI interface for testing
@@ -12,6 +12,7 @@ The pipeline ensures questions are:
 - High-quality (critiqued and iterated by Critic)
 """
 import os
+import asyncio
 from typing import List, Dict, Any, Optional
 import asyncpg
 
@@ -40,7 +41,8 @@ class MultiAgentRAGEngine:
         embedding_service,
         similarity_threshold: float = 0.85,
         max_critic_iterations: int = 2,
-        min_critic_score: int = 7
+        min_critic_score: int = 7,
+        generation_concurrency: Optional[int] = None
     ):
         """
         Initialize the multi-agent RAG engine.
@@ -51,12 +53,14 @@ class MultiAgentRAGEngine:
             similarity_threshold: Cosine similarity threshold for deduplication
             max_critic_iterations: Maximum revision loops with Critic
             min_critic_score: Minimum score required for Critic approval
+            generation_concurrency: Max questions generated at once (defaults to GENERATION_CONCURRENCY env var)
         """
         self.db_pool = db_pool
         self.embedding_service = embedding_service
         self.similarity_threshold = similarity_threshold
         self.max_critic_iterations = max_critic_iterations
         self.min_critic_score = min_critic_score
+        self.generation_concurrency = generation_concurrency or int(os.getenv("GENERATION_CONCURRENCY", "4"))
         
         # Initialize components
         self.retriever = HybridRetriever(db_pool, embedding_service)
@@ -85,19 +89,16 @@ class MultiAgentRAGEngine:
         # Generate embedding for new question
         question_embedding = await self.embedding_service.generate_embedding(question_text)
         
-        import json
-        embedding_str = json.dumps(question_embedding)
-        
         async with self.db_pool.acquire() as conn:
             result = await conn.fetchrow(
                 """
-                SELECT 1 - (embedding <=> $1::vector) as similarity
+                SELECT 1 - (embedding::halfvec(1536) <=> $1::halfvec(1536)) as similarity
                 FROM knowledge_base
                 WHERE source_type = $2
-                ORDER BY embedding <=> $1::vector
+                ORDER BY embedding::halfvec(1536) <=> $1::halfvec(1536)
                 LIMIT 1
                 """,
-                embedding_str,
+                question_embedding,
                 source_type
             )
             
@@ -184,11 +185,26 @@ class MultiAgentRAGEngine:
         style_examples = await self.retriever.fetch_style_examples(topic_list[0], limit=3)
         print(f"    ✓ Found {len(style_examples)} style examples")
 
-        # Cache research briefs per topic to avoid re-fetching on retries
-        research_cache: Dict[str, Any] = {}
+        # Phase 2: Research every topic up front, concurrently; each brief is
+        # then reused for all of that topic's questions and retries
+        print(f"\n🔬 Phase 2: Research")
+        print("-" * 40)
+        await report_progress("research", f"Researcher: Analyzing textbook content for {len(topic_list)} topic(s)...")
+        briefs = await self.researcher.research_topics(
+            topic_list, difficulty, concurrency=self.generation_concurrency
+        )
+        research_cache: Dict[str, ResearchBrief] = {}
+        for current_topic, brief in zip(topic_list, briefs):
+            if isinstance(brief, Exception):
+                print(f"  ✗ Research failed for '{current_topic}': {brief}")
+                await report_progress("error", f"Research failed for '{current_topic}': {brief}")
+                continue
+            research_cache[current_topic] = brief
+            print(f"  ✓ '{current_topic}': {len(brief.core_facts)} facts, {len(brief.key_definitions)} definitions")
+            await report_progress("research", f"Researcher: Found {len(brief.core_facts)} facts for '{current_topic}'")
         
-        # Phase 2: Multi-Agent Generation Loop
-        print(f"\n🤖 Phase 2: Multi-Agent Generation Loop")
+        # Phase 3: Multi-Agent Generation Loop
+        print(f"\n🤖 Phase 3: Multi-Agent Generation Loop")
         print("-" * 40)
 
         questions = []
@@ -197,125 +213,134 @@ class MultiAgentRAGEngine:
         # Calculate how many multiple selection questions we need (20%)
         num_multi_questions = int(count * 0.2)
         generated_multi_count = 0
-
-        while len(questions) < count and attempts < max_total_attempts:
-            attempts += 1
-            q_num = len(questions) + 1
-
-            # Round-robin topic assignment so each topic gets equal coverage
-            current_topic = topic_list[(q_num - 1) % len(topic_list)]
-            print(f"\n  Question {q_num}/{count} — topic: '{current_topic}' (attempt {attempts})...")
-
-            # Fetch (or reuse cached) research brief for this topic
-            if current_topic not in research_cache:
-                print(f"    • Researcher: Extracting facts for '{current_topic}'...")
-                await report_progress("research", f"Researcher: Analyzing textbook content for '{current_topic}'...")
-                try:
-                    brief = await self.researcher.research(current_topic, difficulty)
-                    research_cache[current_topic] = brief
-                    print(f"      ✓ Found {len(brief.core_facts)} facts, {len(brief.key_definitions)} definitions")
-                    await report_progress("research", f"Researcher: Found {len(brief.core_facts)} facts for '{current_topic}'")
-                except Exception as e:
-                    print(f"      ✗ Research failed for '{current_topic}': {e}")
-                    await report_progress("error", f"Research failed for '{current_topic}': {e}")
-                    continue
-
-            research_brief = research_cache[current_topic]
-            
-            # Determine forced type for this question
-            # If we still need multi-select questions, and the current slot suggests it's time, or if we are running out of slots
-            remaining_slots = count - len(questions)
-            remaining_multi_needed = num_multi_questions - generated_multi_count
-            
-            forced_type = "single_select"
-            # Force multi-select if we still need them and:
-            # 1. We're at a 5th interval (20% -> 1 in 5)
-            # 2. Or we're running out of slots and must fill the quota
-            if remaining_multi_needed > 0:
-                if (q_num % 5 == 0) or (remaining_slots <= remaining_multi_needed):
-                    forced_type = "multiple_selection"
-            
-            await report_progress("draft", f"Generating Question {q_num}/{count} ({forced_type})...")
+        
+        # Bounds concurrent question pipelines (each makes 2+ LLM calls)
+        semaphore = asyncio.Semaphore(self.generation_concurrency)
+
+        async def generate_slot(q_num: int, current_topic: str, forced_type: str) -> None:
+            """Draft, review and revise one question, keeping it if approved"""
+            nonlocal generated_multi_count
+            research_brief = research_cache.get(current_topic)
+            if research_brief is None:
+                return
             
-            try:
-                # Agent 2: Psychometrician drafts the question
-                print(f"    • Psychometrician: Drafting question ({forced_type})...")
-                await report_progress("draft", f"Psychometrician: Drafting question {q_num}...")
-                draft = await self.psychometrician.draft_question(
-                    research_brief=research_brief,
-                    style_profile=style_profile,
-                    style_examples=style_examples,
-                    difficulty=difficulty,
-                    forced_question_type=forced_type
-                )
-                print(f"      ✓ Draft created")
-                print(f"        - Cognitive level: {draft.cognitive_level}")
-                print(f"        - Distractor reasoning: {len(draft.distractor_reasoning)} distractors")
-                
-                # Agent 3: Critic reviews and iterates
-                print(f"    • Critic: Reviewing question...")
-                await report_progress("critic", f"Critic: Reviewing draft for quality and accuracy...")
-                review = await self.critic.review(
-                    question=draft,
-                    research_brief=research_brief,
-                    min_score=self.min_critic_score
-                )
+            async with semaphore:
+                await report_progress("draft", f"Generating Question {q_num}/{count} ({forced_type})...")
                 
-                # Revision loop
-                current_draft = draft
-                for iteration in range(self.max_critic_iterations):
-                    if review.approved:
-                        break
-                    
-                    print(f"      ⚠ Not approved (score: {review.score}/10)")
-                    print(f"      • Psychometrician: Revising based on feedback...")
-                    
-                    await report_progress("revise", f"Psychometrician: Improving question (Critic score: {review.score}/10)...")
-                    
-                    current_draft = await self.psychometrician.revise_question(
-                        current_draft=current_draft,
-                        feedback=review.suggestions,
-                        research_brief=research_brief
+                try:
+                    # Agent 2: Psychometrician drafts the question
+                    print(f"  • Q{q_num} Psychometrician: Drafting question ({forced_type}) on '{current_topic}'...")
+                    await report_progress("draft", f"Psychometrician: Drafting question {q_num}...")
+                    # Self-reviewed against the Critic's rubric in the same call,
+                    # so most drafts pass the first review without a revision
+                    reviewed = await self.psychometrician.draft_and_self_review(
+                        research_brief=research_brief,
+                        style_profile=style_profile,
+                        style_examples=style_examples,
+                        difficulty=difficulty,
+                        forced_question_type=forced_type
                     )
+                    draft = reviewed.question
+                    print(f"    ✓ Q{q_num} draft created ({len(reviewed.self_review)} self-review fixes, "
+                          f"{draft.cognitive_level}, {len(draft.distractor_reasoning)} distractors)")
                     
-                    # Re-review
+                    # Agent 3: Critic reviews and iterates
+                    await report_progress("critic", f"Critic: Reviewing draft for quality and accuracy...")
                     review = await self.critic.review(
-                        question=current_draft,
+                        question=draft,
                         research_brief=research_brief,
                         min_score=self.min_critic_score
                     )
+                    
+                    # Revision loop
+                    current_draft = draft
+                    for iteration in range(self.max_critic_iterations):
+                        if review.approved:
+                            break
+                        
+                        print(f"    ⚠ Q{q_num} not approved (score: {review.score}/10), revising...")
+                        await report_progress("revise", f"Psychometrician: Improving question (Critic score: {review.score}/10)...")
+                        
+                        current_draft = await self.psychometrician.revise_question(
+                            current_draft=current_draft,
+                            feedback=review.suggestions,
+                            research_brief=research_brief
+                        )
+                        
+                        # Re-review
+                        review = await self.critic.review(
+                            question=current_draft,
+                            research_brief=research_brief,
+                            min_score=self.min_critic_score
+                        )
+                    
+                    if review.approved:
+                        print(f"    ✓ Q{q_num} approved (score: {review.score}/10)")
+                        await report_progress("approve", f"Critic: Question approved (Score: {review.score}/10)")
+                    else:
+                        print(f"    ⚠ Q{q_num} not approved after {self.max_critic_iterations} revisions")
+                        await report_progress("reject", f"Critic: Question rejected after revisions")
+                        return
+                    
+                    # Check for duplicates
+                    if await self.is_duplicate(current_draft.question):
+                        print(f"    ⚠ Q{q_num} skipped (duplicate)")
+                        await report_progress("skip", "Skipping duplicate question")
+                        return
+                    
+                    # Convert to response format
+                    question_dict = self._draft_to_response(current_draft, review)
+                    questions.append(question_dict)
+                    
+                    if question_dict.get('question_type') == 'multiple_selection':
+                        generated_multi_count += 1
+                    
+                    print(f"    ✓ Q{q_num} added")
+                    
+                    # Report success and stream question
+                    await report_progress("success", f"Question {q_num} generated successfully")
+                    await report_question(question_dict)
+                    
+                except Exception as e:
+                    print(f"    ✗ Q{q_num} failed: {str(e)}")
+                    await report_progress("error", f"Error generating question: {str(e)}")
+
+        # Each round runs one pipeline per missing question concurrently, so
+        # wall-clock time is that of the slowest pipeline rather than the sum;
+        # failed or rejected slots are retried in the next round
+        while len(questions) < count and attempts < max_total_attempts:
+            round_size = min(count - len(questions), max_total_attempts - attempts)
+            planned_multi_count = generated_multi_count
+            slots = []
+            
+            for offset in range(round_size):
+                attempts += 1
+                q_num = len(questions) + offset + 1
+
+                # Round-robin topic assignment so each topic gets equal coverage
+                current_topic = topic_list[(q_num - 1) % len(topic_list)]
                 
-                if review.approved:
-                    print(f"      ✓ Approved (score: {review.score}/10)")
-                    await report_progress("approve", f"Critic: Question approved (Score: {review.score}/10)")
-                else:
-                    print(f"      ⚠ Not approved after {self.max_critic_iterations} revisions")
-                    await report_progress("reject", f"Critic: Question rejected after revisions")
-                    continue
-                
-                # Check for duplicates
-                if await self.is_duplicate(current_draft.question):
-                    print(f"    ⚠ Skipped (duplicate)")
-                    await report_progress("skip", "Skipping duplicate question")
-                    continue
-                
-                # Convert to response format
-                question_dict = self._draft_to_response(current_draft, review)
-                questions.append(question_dict)
-                
-                if question_dict.get('question_type') == 'multiple_selection':
-                    generated_multi_count += 1
-                
-                print(f"    ✓ Question added")
+                # Determine forced type for this question
+                # If we still need multi-select questions, and the current slot suggests it's time, or if we are running out of slots
+                remaining_slots = count - (q_num - 1)
+                remaining_multi_needed = num_multi_questions - planned_multi_count
                 
-                # Report success and stream question
-                await report_progress("success", f"Question {q_num} generated successfully")
-                await report_question(question_dict)
+                forced_type = "single_select"
+                # Force multi-select if we still need them and:
+                # 1. We're at a 5th interval (20% -> 1 in 5)
+                # 2. Or we're running out of slots and must fill the quota
+                if remaining_multi_needed > 0:
+                    if (q_num % 5 == 0) or (remaining_slots <= remaining_multi_needed):
+                        forced_type = "multiple_selection"
+                        planned_multi_count += 1
                 
-            except Exception as e:
-                print(f"    ✗ Failed: {str(e)}")
-                await report_progress("error", f"Error generating question: {str(e)}")
-                continue
+                slots.append((q_num, current_topic, forced_type))
+            
+            print(f"\n  Round of {len(slots)} question(s) (attempts {attempts - len(slots) + 1}-{attempts})...")
+            await asyncio.gather(*(generate_slot(*slot) for slot in slots))
+            
+            if not research_cache:
+                break
         
         # Summary
         print(f"\n{'='*60}")
@@ -411,9 +436,7 @@ class DualPathRetriever:
         similarity_threshold: float = 0.7
     ) -> List[Dict[str, Any]]:
         """Retrieve factual textbook content relevant to the query."""
-        query_embedding = await self.embedding_service.generate_embedding(query)
-        import json
-        embedding_str = json.dumps(query_embedding)
+        query_embedding = await self.embedding_service.generate_embedding(query, kind="query")
         
         async with self.db_pool.acquire() as conn:
             rows = await conn.fetch(
@@ -421,14 +444,14 @@ class DualPathRetriever:
                 SELECT 
                     content,
                     metadata,
-                    1 - (embedding <=> $1::vector) as similarity
+                    1 - (embedding::halfvec(1536) <=> $1::halfvec(1536)) as similarity
                 FROM knowledge_base
                 WHERE source_type IN ('textbook', 'diagram')
-                    AND 1 - (embedding <=> $1::vector) > $2
-                ORDER BY embedding <=> $1::vector
+                    AND 1 - (embedding::halfvec(1536) <=> $1::halfvec(1536)) > $2
+                ORDER BY embedding::halfvec(1536) <=> $1::halfvec(1536)
                 LIMIT $3
                 """,
-                embedding_str,
+                query_embedding,
                 similarity_threshold,
                 limit
             )
@@ -436,7 +459,7 @@ class DualPathRetriever:
             return [
                 {
                     'content': row['content'],
-                    'metadata': dict(row['metadata']),
+                    'metadata': row['metadata'] or {},
                     'similarity': float(row['similarity'])
                 }
                 for row in rows
@@ -449,9 +472,7 @@ class DualPathRetriever:
         limit: int = 3
     ) -> List[Dict[str, Any]]:
         """Fetch sample question styles from exam papers."""
-        query_embedding = await self.embedding_service.generate_embedding(query)
-        import json
-        embedding_str = json.dumps(query_embedding)
+        query_embedding = await self.embedding_service.generate_embedding(query, kind="query")
         
         async with self.db_pool.acquire() as conn:
             rows = await conn.fetch(
@@ -460,19 +481,19 @@ class DualPathRetriever:
                     content,
                     metadata,
                     source_type,
-                    1 - (embedding <=> $1::vector) as similarity
+                    1 - (embedding::halfvec(1536) <=> $1::halfvec(1536)) as similarity
                 FROM knowledge_base
                 WHERE source_type IN ('exam_paper', 'question')
-                    AND 1 - (embedding <=> $1::vector) > $2
+                    AND 1 - (embedding::halfvec(1536) <=> $1::halfvec(1536)) > $2
                 ORDER BY 
                     CASE 
                         WHEN source_type = 'exam_paper' THEN 0
                         ELSE 1
                     END,
-                    embedding <=> $1::vector
+                    embedding::halfvec(1536) <=> $1::halfvec(1536)
                 LIMIT $3
                 """,
-                embedding_str,
+                query_embedding,
                 similarity_threshold,
                 limit
             )
@@ -480,7 +501,7 @@ class DualPathRetriever:
             return [
                 {
                     'content': row['content'],
-                    'metadata': dict(row['metadata']),
+                    'metadata': row['metadata'] or {},
                     'similarity': float(row['similarity']),
                     'source_type': row['source_type']
                 }
@@ -588,19 +609,17 @@ class RAGEngine:
     
     async def is_duplicate(self, question_text: str, source_type: str = 'question') -> bool:
         question_embedding = await self.embedding_service.generate_embedding(question_text)
-        import json
-        embedding_str = json.dumps(question_embedding)
         
         async with self.db_pool.acquire() as conn:
             result = await conn.fetchrow(
                 """
-                SELECT 1 - (embedding <=> $1::vector) as similarity
+                SELECT 1 - (embedding::halfvec(1536) <=> $1::halfvec(1536)) as similarity
                 FROM knowledge_base
                 WHERE source_type = $2
-                ORDER BY embedding <=> $1::vector
+                ORDER BY embedding::halfvec(1536) <=> $1::halfvec(1536)
                 LIMIT 1
                 """,
-                embedding_str,
+                question_embedding,
                 source_type
             )
             
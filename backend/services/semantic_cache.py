@@ -0,0 +1,124 @@
+"""
+Semantic cache: reuses retrieval results for paraphrased queries.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+
+class SemanticCache:
+    """
+    LRU cache of retrieval results keyed by query embedding similarity.
+    
+    A lookup hits when a cached query embedding in the same scope has cosine
+    similarity >= threshold with the new one, so "AWS IAM" and "IAM on AWS"
+    share one knowledge base search. Capacity is small enough that scoring
+    every cached vector with one matrix-vector product is cheaper than a
+    database round trip.
+    """
+    
+    def __init__(
+        self,
+        capacity: int = 100,
+        threshold: float = 0.85,
+        ttl: Optional[float] = None
+    ):
+        """
+        Initialize the semantic cache.
+        
+        Args:
+            capacity: Maximum cached queries (0 disables the cache)
+            threshold: Minimum query-to-query cosine similarity for a hit
+            ttl: Seconds an entry stays valid (None = until evicted or cleared)
+        """
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        # id -> (scope, normalized embedding, results, expiry or None)
+        self._entries: "OrderedDict[int, Tuple[Hashable, np.ndarray, List[Dict[str, Any]], Optional[float]]]" = OrderedDict()
+        self._next_id = 0
+        
+        # Normalized vectors of all entries stacked row-wise (rows follow
+        # _matrix_ids); rebuilt on the first lookup after entries change
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: List[int] = []
+    
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        """Scale an embedding to unit length so a dot product is its cosine."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector)) or 1.0
+        return vector / norm
+    
+    def get(self, embedding: List[float], scope: Hashable) -> Optional[List[Dict[str, Any]]]:
+        """
+        Find cached results for a semantically similar query.
+        
+        Args:
+            embedding: Query embedding
+            scope: Search parameters the results depend on (filters, limit)
+            
+        Returns:
+            Copy of the cached results, or None on a miss
+        """
+        if not self.capacity or not self._entries:
+            return None
+        
+        if self._matrix is None:
+            self._matrix_ids = list(self._entries)
+            self._matrix = np.stack([self._entries[i][1] for i in self._matrix_ids])
+        
+        scores = self._matrix @ self._normalize(embedding)
+        now = time.monotonic()
+        best_id, best_score = None, self.threshold
+        expired = []
+        for row in np.flatnonzero(scores >= self.threshold):
+            entry_id = self._matrix_ids[row]
+            entry = self._entries.get(entry_id)
+            if entry is None or entry[0] != scope:
+                continue
+            if entry[3] is not None and entry[3] < now:
+                expired.append(entry_id)
+                continue
+            if scores[row] >= best_score:
+                best_id, best_score = entry_id, scores[row]
+        
+        if expired:
+            for entry_id in expired:
+                del self._entries[entry_id]
+            self._matrix = None
+        
+        if best_id is None:
+            return None
+        
+        self._entries.move_to_end(best_id)
+        return [dict(result) for result in self._entries[best_id][2]]
+    
+    def put(self, embedding: List[float], scope: Hashable, results: List[Dict[str, Any]]) -> None:
+        """
+        Cache results for a query, evicting the least recently used entry.
+        
+        Args:
+            embedding: Query embedding
+            scope: Search parameters the results depend on
+            results: Retrieval results to cache
+        """
+        if not self.capacity:
+            return
+        
+        self._entries[self._next_id] = (
+            scope,
+            self._normalize(embedding),
+            [dict(result) for result in results],
+            time.monotonic() + self.ttl if self.ttl else None
+        )
+        self._next_id += 1
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        self._matrix = None
+    
+    def clear(self) -> None:
+        """Drop all entries (call when the knowledge base changes)."""
+        self._entries.clear()
+        self._matrix = None
@@ -147,7 +147,7 @@ class StyleAnalyzer:
                 {
                     'id': str(row['id']),
                     'content': row['content'],
-                    'metadata': dict(row['metadata'])
+                    'metadata': row['metadata'] or {}
                 }
                 for row in rows
             ]
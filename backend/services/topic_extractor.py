@@ -6,7 +6,7 @@ pages which typically contain the Table of Contents. Stores results in
 the `topics` database table.
 """
 import asyncpg
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from .agents.base_agent import BaseAgent
 
 
@@ -16,8 +16,9 @@ class TopicExtractor:
     them to the `topics` database table.
     """
 
-    def __init__(self, db_pool: asyncpg.Pool):
+    def __init__(self, db_pool: asyncpg.Pool, agent: Optional[BaseAgent] = None):
         self.db_pool = db_pool
+        self.agent = agent or BaseAgent()
 
     async def extract_and_store(self, filename: str) -> List[str]:
         """
@@ -83,7 +84,7 @@ class TopicExtractor:
 
     async def _call_llm(self, filename: str, context_text: str) -> List[str]:
         """Ask the LLM to extract topics from the textbook context."""
-        agent = BaseAgent()
+        agent = self.agent
 
         system_prompt = (
             "You are an expert curriculum analyst. "
@@ -2,7 +2,8 @@
 Vision service using Claude Vision API for diagram and image description.
 """
 import os
-from typing import Optional
+import asyncio
+from typing import List, Optional
 
 
 class VisionService:
@@ -11,7 +12,8 @@ class VisionService:
     def __init__(
         self,
         api_key: Optional[str] = None,
-        model: str = "gpt-4o"
+        model: str = "gpt-4o",
+        concurrency: Optional[int] = None
     ):
         """
         Initialize the vision service.
@@ -19,6 +21,7 @@ class VisionService:
         Args:
             api_key: OpenAI API key (defaults to env var)
             model: OpenAI model with vision capabilities (default: gpt-4o)
+            concurrency: Max images described at once (defaults to VISION_CONCURRENCY env var)
         """
         api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not api_key:
@@ -27,6 +30,7 @@ class VisionService:
         from openai import AsyncOpenAI
         self.client = AsyncOpenAI(api_key=api_key)
         self.model = model
+        self.concurrency = concurrency or int(os.getenv("VISION_CONCURRENCY", "8"))
     
     async def describe_diagram(
         self,
@@ -91,35 +95,42 @@ Be thorough and precise. This description will be used to generate exam question
         self,
         images: list[dict],
         context: Optional[str] = None
-    ) -> list[str]:
+    ) -> List[Optional[str]]:
         """
-        Describe multiple images.
+        Describe multiple images concurrently, bounded by self.concurrency.
+        
+        A failed image does not fail the batch: its slot is None, so results
+        stay aligned with the input order.
         
         Args:
             images: List of dicts with 'data' (base64) and 'format' keys
             context: Optional context for all images
             
         Returns:
-            List of descriptions
+            List of descriptions (None for images that failed)
         """
-        import asyncio
+        semaphore = asyncio.Semaphore(self.concurrency)
         
-        tasks = [
-            self.describe_diagram(
-                img['data'],
-                img.get('format', 'png'),
-                context
-            )
-            for img in images
-        ]
+        async def describe_one(idx: int, img: dict) -> Optional[str]:
+            async with semaphore:
+                try:
+                    return await self.describe_diagram(
+                        img['data'],
+                        img.get('format', 'png'),
+                        context
+                    )
+                except Exception as e:
+                    print(f"Warning: Failed to describe image {idx}: {e}")
+                    return None
         
-        return await asyncio.gather(*tasks)
+        return await asyncio.gather(*(
+            describe_one(idx, img) for idx, img in enumerate(images)
+        ))
 
 
 # CLI interface for testing
 if __name__ == "__main__":
     import sys
-    import asyncio
     import base64
     from pathlib import Path
     from dotenv import load_dotenv
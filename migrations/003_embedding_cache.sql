@@ -0,0 +1,13 @@
+-- Migration 003: Persistent embedding cache
+-- Embeddings keyed by sha256(model || '\0' || text) so unchanged content
+-- is never sent to the embeddings API twice
+
+CREATE TABLE IF NOT EXISTS public.embedding_cache (
+    hash BYTEA PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    embedding vector(1536) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
+
+COMMENT ON TABLE public.embedding_cache IS 'Content-hash keyed embeddings reused across ingests and queries';
@@ -0,0 +1,6 @@
+-- Migration 004: Index the /files aggregation
+-- Lets GROUP BY (metadata->>'filename', source_type) use an index scan
+-- instead of extracting JSONB from every knowledge_base row
+
+CREATE INDEX IF NOT EXISTS knowledge_base_filename_source_type_idx
+ON public.knowledge_base ((metadata->>'filename'), source_type);
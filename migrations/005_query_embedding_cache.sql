@@ -0,0 +1,9 @@
+-- Migration 005: Tag cached embeddings by kind
+-- Query embeddings (topics) are preloaded into memory at startup, so they
+-- need to be told apart from the much larger set of ingested chunks
+
+ALTER TABLE public.embedding_cache
+    ADD COLUMN IF NOT EXISTS kind TEXT NOT NULL DEFAULT 'document';
+
+CREATE INDEX IF NOT EXISTS embedding_cache_model_kind_created_idx
+    ON public.embedding_cache (model, kind, created_at DESC);
@@ -0,0 +1,11 @@
+-- Migration 006: Replace the ivfflat embedding index with HNSW
+-- ivfflat lists are fixed when the index is built (on an empty table here),
+-- so recall and speed degrade as documents are ingested. HNSW needs no
+-- training data and keeps top-k search close to O(log n).
+
+DROP INDEX IF EXISTS public.knowledge_base_embedding_idx;
+
+CREATE INDEX IF NOT EXISTS knowledge_base_embedding_hnsw
+    ON public.knowledge_base
+    USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
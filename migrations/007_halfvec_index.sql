@@ -0,0 +1,12 @@
+-- Migration 007: Build the HNSW index over half-precision embeddings
+-- An expression index on embedding::halfvec(1536) stores 2 bytes per
+-- dimension instead of 4, halving index size and the memory bandwidth of
+-- each search. The column keeps full precision; queries must order by the
+-- same expression (embedding::halfvec(1536) <=> $1::halfvec(1536)) to use it.
+
+DROP INDEX IF EXISTS public.knowledge_base_embedding_hnsw;
+
+CREATE INDEX IF NOT EXISTS knowledge_base_embedding_halfvec_hnsw
+    ON public.knowledge_base
+    USING hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
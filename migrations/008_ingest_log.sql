@@ -0,0 +1,18 @@
+-- Migration 008: Ingestion log keyed by file content hash
+-- Lets /ingest return immediately when the exact same PDF bytes were
+-- already ingested as the same source_type, skipping parsing, vision
+-- and embedding calls. Rows are removed when the file is deleted.
+
+CREATE TABLE IF NOT EXISTS public.ingest_log (
+    file_sha256 TEXT NOT NULL,
+    source_type TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    chunks_stored INTEGER NOT NULL,
+    embeddings_generated INTEGER NOT NULL,
+    images_processed INTEGER NOT NULL DEFAULT 0,
+    topics_extracted INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    PRIMARY KEY (file_sha256, source_type)
+);
+
+CREATE INDEX IF NOT EXISTS ingest_log_filename_idx ON public.ingest_log (filename);
@@ -0,0 +1,10 @@
+-- Migration 009: HNSW index over binary-quantized embeddings
+-- binary_quantize() keeps one bit per dimension (192 bytes per row instead
+-- of 3 KB for halfvec), so a Hamming-distance scan over it is very cheap.
+-- Used when VECTOR_BINARY_RERANK > 0: the bit index picks a candidate pool
+-- that is then reranked by exact halfvec cosine distance.
+
+CREATE INDEX IF NOT EXISTS knowledge_base_embedding_bit_hnsw
+    ON public.knowledge_base
+    USING hnsw ((binary_quantize(embedding)::bit(1536)) bit_hamming_ops)
+    WITH (m = 16, ef_construction = 64);
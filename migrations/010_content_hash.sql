@@ -0,0 +1,13 @@
+-- Migration 010: Content hash per knowledge_base row
+-- Re-ingesting a revised PDF mostly repeats chunks that are already stored
+-- for that file. Ingest looks up sha256(content) per (source_type, file)
+-- and only embeds and inserts the chunks that are new.
+
+ALTER TABLE public.knowledge_base ADD COLUMN IF NOT EXISTS content_sha256 BYTEA;
+
+UPDATE public.knowledge_base
+SET content_sha256 = sha256(convert_to(content, 'UTF8'))
+WHERE content_sha256 IS NULL;
+
+CREATE INDEX IF NOT EXISTS knowledge_base_content_sha256_idx
+    ON public.knowledge_base (content_sha256);